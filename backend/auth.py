@@ -1,25 +1,224 @@
+import asyncio
 import os
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Tuple
 from dotenv import load_dotenv
-from jose import jwt
+from fastapi import Depends, Header, HTTPException, Query
+from jose import JWTError, jwt
 from passlib.context import CryptContext
+from database import users_repo
+from observability import PASSWORD_HASH_DURATION
 
 # Load environment variables from .env file
 load_dotenv()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes needs_update() flag any
+# hash created under a different cost, so logins can rehash transparently.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
 
 if SECRET_KEY is None:
     raise ValueError("JWT_SECRET environment variable not set. Please set it to a strong secret string.")
 
+# bcrypt releases the GIL, so a small thread pool runs hashes in parallel
+# without blocking the event loop. Work beyond HASH_QUEUE_LIMIT is rejected
+# with 503 instead of queueing up behind a login storm.
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+HASH_RETRY_AFTER_SECONDS = 2
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_executor_pid: Optional[int] = None
+_hash_jobs = 0
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    # Created in the worker that uses it: threads do not survive fork()
+    global _hash_executor, _hash_executor_pid
+    if _hash_executor is None or _hash_executor_pid != os.getpid():
+        _hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+        _hash_executor_pid = os.getpid()
+    return _hash_executor
+
+def shutdown_hash_executor() -> None:
+    # Lets in-flight hashes finish; called once requests have drained
+    global _hash_executor
+    if _hash_executor is not None and _hash_executor_pid == os.getpid():
+        _hash_executor.shutdown(wait=True)
+    _hash_executor = None
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+def _timed(operation: str, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+async def _run_hash_job(operation: str, fn, *args):
+    global _hash_jobs
+    if _hash_jobs >= HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication service is busy, please retry shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)}
+        )
+    _hash_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), _timed, operation, fn, *args)
+    finally:
+        _hash_jobs -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hash_job("hash", hash_password, password)
+
+# Returns (valid, new_hash); new_hash is set when the stored hash was created
+# with outdated cost parameters and should replace the stored one.
+async def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hash_job("verify", pwd_context.verify_and_update, plain, hashed)
+
 def create_token(data: dict, expires_minutes=30):
     to_encode = data.copy()
-    to_encode.update({"exp": datetime.now() + timedelta(minutes=expires_minutes)})
+    to_encode.update({"exp": datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# Small LRU cache whose entries also expire after a TTL
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        self._data.pop(key, None)
+
+
+# Verified token claims, so each token's signature is checked once rather than
+# on every request. Entries never outlive the token's own expiry.
+_token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300")),
+)
+# User profiles by email, replacing the per-request users lookup
+_profile_cache = TTLCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60")),
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: str
+    email: str
+    name: str
+    role: str
+    profileImage: Optional[str] = None
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def decode_token(token: str) -> dict:
+    claims = _token_cache.get(token)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise _unauthorized("Invalid or expired token")
+    # Tokens without an expiry are kept for the cache's own TTL
+    expires_at = claims.get("exp")
+    _token_cache.set(token, claims, ttl=expires_at - time.time() if expires_at is not None else None)
+    return claims
+
+
+async def get_profile(email: str) -> Optional[Principal]:
+    principal = _profile_cache.get(email)
+    if principal is not None:
+        return principal
+    user = await users_repo.find_one({"email": email}, {"name": 1, "email": 1, "role": 1, "profileImage": 1})
+    if not user:
+        return None
+    return cache_profile(user)
+
+
+def cache_profile(user: dict) -> Principal:
+    principal = Principal(
+        id=str(user["_id"]),
+        email=user["email"],
+        name=user["name"],
+        role=user["role"],
+        profileImage=user.get("profileImage"),
+    )
+    _profile_cache.set(principal.email, principal)
+    return principal
+
+
+# FastAPI caches dependency results per request, so the principal is resolved
+# at most once per request however many dependants ask for it.
+async def get_optional_principal(authorization: Optional[str] = Header(None)) -> Optional[Principal]:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized("Invalid authorization header")
+    return await _principal_for_token(token)
+
+
+async def _principal_for_token(token: str) -> Principal:
+    claims = decode_token(token)
+    principal = await get_profile(claims.get("email", ""))
+    if principal is None:
+        raise _unauthorized("User no longer exists")
+    return principal
+
+
+# For endpoints that act on the caller's own data
+async def get_current_principal(principal: Optional[Principal] = Depends(get_optional_principal)) -> Principal:
+    if principal is None:
+        raise _unauthorized("Not authenticated")
+    return principal
+
+
+# EventSource cannot send an Authorization header, so event streams also
+# accept the token as ?access_token= (the access log records the path only).
+async def get_stream_principal(
+    authorization: Optional[str] = Header(None), access_token: Optional[str] = Query(None)
+) -> Principal:
+    if access_token and not authorization:
+        return await _principal_for_token(access_token)
+    return await get_current_principal(await get_optional_principal(authorization))
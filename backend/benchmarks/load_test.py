@@ -0,0 +1,331 @@
+# Load-test harness: seeds a throwaway MongoDB, drives the FastAPI app
+# in-process at a fixed concurrency and reports p50/p95/p99 latency,
+# throughput and peak RSS per endpoint. Results can be saved as a named
+# baseline and later runs compared against it.
+#
+#   python benchmarks/load_test.py --save-baseline main
+#   python benchmarks/load_test.py --compare main --concurrency 64
+#
+# A temporary mongod (which must be on PATH) is started in a scratch
+# directory unless --mongo-uri is given; an external database is only
+# re-seeded with --seed-data, since seeding drops the eduquest collections.
+# mongomock cannot stand in here: the backend uses pymongo's async client
+# and GridFS, which it does not emulate. Requires httpx.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+from pymongo import MongoClient
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from login_storm import percentile  # noqa: E402
+from seed_data import DATABASE_NAME, STUDENT_PASSWORD, sample_existing, seed, student_email  # noqa: E402
+
+UPLOAD_SIZES = (4 * 1024, 150 * 1024, 2 * 1024 * 1024)
+RSS_SAMPLE_SECONDS = 0.05
+
+
+# --- throwaway mongod -------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TemporaryMongod:
+    def __init__(self):
+        self.dbpath = tempfile.mkdtemp(prefix="eduquest-bench-")
+        self.port = _free_port()
+        self.process = None
+
+    @property
+    def uri(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "TemporaryMongod":
+        mongod = shutil.which("mongod")
+        if not mongod:
+            raise SystemExit("mongod not found on PATH; install MongoDB or pass --mongo-uri")
+        self.process = subprocess.Popen(
+            [mongod, "--dbpath", self.dbpath, "--port", str(self.port), "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL,
+        )
+        client = MongoClient(self.uri, serverSelectionTimeoutMS=500)
+        for _ in range(60):
+            try:
+                client.admin.command("ping")
+                break
+            except Exception:
+                time.sleep(0.5)
+        else:
+            self.__exit__()
+            raise SystemExit("mongod did not start")
+        client.close()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.process:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+        shutil.rmtree(self.dbpath, ignore_errors=True)
+
+
+# --- measurement ------------------------------------------------------------
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource  # Not Linux: fall back to the process-wide peak
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _sample_rss(peak: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], current_rss_mb())
+        try:
+            await asyncio.wait_for(stop.wait(), RSS_SAMPLE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_scenario(client, name, make_request, requests: int, concurrency: int) -> dict:
+    latencies = []
+    statuses = Counter()
+    queue = iter(range(requests))
+
+    async def worker():
+        for i in queue:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            # Streams are read to the end so downloads are timed in full
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    peak = [current_rss_mb()]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(peak, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak[0],
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+    print(
+        f"{name:<22} p50={result['p50_ms']:8.1f}ms p95={result['p95_ms']:8.1f}ms "
+        f"p99={result['p99_ms']:8.1f}ms {result['throughput_rps']:9.1f} req/s "
+        f"rss={result['peak_rss_mb']:7.1f}MB statuses={result['statuses']}"
+    )
+    return result
+
+
+# --- scenarios --------------------------------------------------------------
+
+def build_scenarios(data: dict, rng: random.Random) -> dict:
+    task_ids = data["task_ids"]
+    submission_ids = data["submission_ids"]
+    bodies = [rng.randbytes(size) for size in UPLOAD_SIZES]
+    upload_counter = itertools.count()
+    tokens = {}
+
+    def auth_header(email):
+        # Submissions are made as the signed-in student; sign once per student
+        # rather than logging in, which would put bcrypt in the upload timings
+        if email not in tokens:
+            from auth import create_token
+            tokens[email] = create_token({"sub": email, "email": email}, expires_minutes=24 * 60)
+        return {"Authorization": f"Bearer {tokens[email]}"}
+
+    def student(i):
+        return student_email(rng.randrange(data["students"]))
+
+    async def tasks(client, i):
+        return await client.get("/tasks")
+
+    async def task(client, i):
+        return await client.get(f"/tasks/{rng.choice(task_ids)}")
+
+    async def task_submissions(client, i):
+        return await client.get("/submissions", params={"taskId": rng.choice(task_ids), "limit": 50})
+
+    async def student_submissions(client, i):
+        return await client.get("/submissions", params={"studentId": student(i), "limit": 50})
+
+    async def dashboard(client, i):
+        return await client.get(f"/students/{student(i)}/dashboard")
+
+    async def login(client, i):
+        return await client.post("/login", json={"email": student(i), "password": STUDENT_PASSWORD})
+
+    async def upload(client, i):
+        n = next(upload_counter)
+        return await client.post(
+            f"/tasks/{rng.choice(task_ids)}/submit",
+            data={"task_title": "Benchmark upload"},
+            # Unique bodies, so every upload exercises a full store write
+            files={"file": (f"upload-{n}.bin", bodies[n % len(bodies)] + n.to_bytes(8, "big"))},
+            headers=auth_header(student(i)),
+        )
+
+    async def download(client, i):
+        return await client.get(f"/submissions/file/{rng.choice(submission_ids)}")
+
+    return {
+        "GET /tasks": tasks,
+        "GET /tasks/{id}": task,
+        "GET /submissions?taskId": task_submissions,
+        "GET /submissions?studentId": student_submissions,
+        "GET /students/{id}/dashboard": dashboard,
+        "POST /login": login,
+        "POST /tasks/{id}/submit": upload,
+        "GET /submissions/file/{id}": download,
+    }
+
+
+# --- baselines --------------------------------------------------------------
+
+def _baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name: str, report: dict) -> None:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(_baseline_path(name), "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"baseline saved to {_baseline_path(name)}")
+
+
+def compare_baseline(name: str, report: dict, max_regression: float) -> bool:
+    # Returns False when any endpoint's p95 or throughput regressed by more
+    # than max_regression (a fraction).
+    with open(_baseline_path(name)) as f:
+        baseline = json.load(f)
+    ok = True
+    print(f"\ncompared with baseline {name!r}:")
+    for endpoint, current in report["results"].items():
+        previous = baseline["results"].get(endpoint)
+        if not previous:
+            print(f"{endpoint:<28} (not in baseline)")
+            continue
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        rps_change = current["throughput_rps"] / previous["throughput_rps"] - 1 if previous["throughput_rps"] else 0.0
+        rss_change = current["peak_rss_mb"] - previous["peak_rss_mb"]
+        regressed = p95_change > max_regression or rps_change < -max_regression
+        ok = ok and not regressed
+        print(
+            f"{endpoint:<28} p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}  "
+            f"rss {rss_change:+7.1f}MB{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+# --- driver -----------------------------------------------------------------
+
+async def drive(args, data: dict) -> dict:
+    # Imported only now: the backend reads MONGO_URI and friends at import time
+    from main import app
+
+    rng = random.Random(args.seed)
+    scenarios = build_scenarios(data, rng)
+    selected = args.endpoints or list(scenarios)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=120) as client:
+            for name in selected:
+                requests = args.login_requests if name == "POST /login" else args.requests
+                # A short warm-up fills caches and connection pools first
+                await run_scenario(client, name, scenarios[name], min(args.concurrency, requests), args.concurrency)
+                results[name] = await run_scenario(client, name, scenarios[name], requests, args.concurrency)
+    return {
+        "config": {
+            "tasks": args.tasks,
+            "students": args.students,
+            "submissions": args.submissions,
+            "files": args.files,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main(args) -> int:
+    mongod = None
+    mongo_uri = args.mongo_uri
+    if not mongo_uri:
+        mongod = TemporaryMongod().__enter__()
+        mongo_uri = mongod.uri
+    try:
+        os.environ["MONGO_URI"] = mongo_uri
+        os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+        os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+
+        database = MongoClient(mongo_uri)[DATABASE_NAME]
+        if mongod or args.seed_data:
+            started = time.perf_counter()
+            data = seed(database, args.tasks, args.students, args.submissions, args.files, args.seed)
+            print(f"seeded {args.submissions:,} submissions in {time.perf_counter() - started:.1f}s")
+        else:
+            data = sample_existing(database)
+
+        report = asyncio.run(drive(args, data))
+        if args.save_baseline:
+            save_baseline(args.save_baseline, report)
+        if args.compare and not compare_baseline(args.compare, report, args.max_regression):
+            return 1
+        return 0
+    finally:
+        if mongod:
+            mongod.__exit__()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend load test against a seeded MongoDB")
+    parser.add_argument("--mongo-uri", help="use this MongoDB instead of a temporary mongod")
+    parser.add_argument("--seed-data", action="store_true", help="re-seed the database given by --mongo-uri")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--submissions", type=int, default=500_000)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--login-requests", type=int, default=200, help="requests for /login (bcrypt bound)")
+    parser.add_argument("--endpoints", nargs="*", help="subset of endpoint names to run")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="allowed p95/throughput change")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,82 @@
+# Login-storm benchmark: measures latency of an unrelated endpoint while a
+# burst of concurrent logins hits /login. With bcrypt offloaded to the worker
+# pool the probe's p99 should stay close to its idle baseline.
+#
+# Usage (against a running backend with a seeded account):
+#   python benchmarks/login_storm.py --email student@example.com --password secret
+# Requires httpx (pip install httpx).
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, samples):
+    print(
+        f"{label:<18} n={len(samples):<5} "
+        f"p50={percentile(samples, 50) * 1000:7.1f}ms "
+        f"p95={percentile(samples, 95) * 1000:7.1f}ms "
+        f"p99={percentile(samples, 99) * 1000:7.1f}ms"
+    )
+
+
+async def probe(client, path, count, interval):
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login(client, email, password, statuses, latencies):
+    started = time.perf_counter()
+    response = await client.post("/login", json={"email": email, "password": password})
+    latencies.append(time.perf_counter() - started)
+    statuses[response.status_code] += 1
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.logins + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        baseline = await probe(client, args.probe_path, args.probe_requests, args.probe_interval)
+
+        statuses = Counter()
+        login_latencies = []
+        storm = asyncio.gather(*[
+            login(client, args.email, args.password, statuses, login_latencies)
+            for _ in range(args.logins)
+        ])
+        under_load, _ = await asyncio.gather(
+            probe(client, args.probe_path, args.probe_requests, args.probe_interval),
+            storm,
+        )
+
+    print(f"Probe endpoint: GET {args.probe_path}; concurrent logins: {args.logins}")
+    summarize("probe (idle)", baseline)
+    summarize("probe (storm)", under_load)
+    summarize("login", login_latencies)
+    print("login statuses:", dict(statuses))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login-storm latency benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--probe-path", default="/tasks")
+    parser.add_argument("--probe-requests", type=int, default=200)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,200 @@
+# Deterministic data generator for the benchmark harness. Writes users,
+# tasks, file blobs and submissions straight into MongoDB with the schema the
+# backend uses, so load tests start from a realistically sized database.
+#
+# Standalone usage (drops and recreates the eduquest collections!):
+#   python benchmarks/seed_data.py --mongo-uri mongodb://localhost:27017 --submissions 500000
+import argparse
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from gridfs import GridFSBucket
+from passlib.context import CryptContext
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_stats import TASK_STATS_PIPELINE  # noqa: E402
+
+DATABASE_NAME = "eduquest"
+STUDENT_PASSWORD = "benchmark-password"
+BATCH_SIZE = 10_000
+# Median and spread of file sizes; most uploads are small documents and
+# source files with a long tail of larger reports and archives.
+FILE_SIZE_MEDIAN = 150 * 1024
+FILE_SIZE_SIGMA = 1.2
+FILE_SIZE_MAX = 15 * 1024 * 1024
+_WORDS = (
+    "def return class import self value result data task student grade file "
+    "report analysis the of and to in is that for with as on by this"
+).split()
+
+
+def student_email(index: int) -> str:
+    return f"student{index}@example.com"
+
+
+def _object_id(rng: random.Random) -> ObjectId:
+    return ObjectId(rng.randbytes(12))
+
+
+def _file_body(rng: random.Random, size: int) -> bytes:
+    # Roughly 60% text and code, which compresses well, and 40% binary
+    # formats (PDF, DOCX, images) that do not.
+    if rng.random() < 0.6:
+        words = rng.choices(_WORDS, k=size // 5 + 1)
+        return " ".join(words).encode()[:size]
+    return rng.randbytes(size)
+
+
+def _file_size(rng: random.Random) -> int:
+    size = int(rng.lognormvariate(math.log(FILE_SIZE_MEDIAN), FILE_SIZE_SIGMA))
+    return max(1, min(size, FILE_SIZE_MAX))
+
+
+def _insert_batches(collection, docs) -> None:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def seed(database, tasks: int = 200, students: int = 50_000, submissions: int = 500_000,
+         files: int = 500, seed_value: int = 42) -> dict:
+    rng = random.Random(seed_value)
+    for name in ("users", "tasks", "submissions", "progress", "meta", "blobs",
+                 "submission_files.files", "submission_files.chunks"):
+        database.drop_collection(name)
+
+    # One bcrypt hash shared by every account; hashing 50k passwords would
+    # dominate seeding time without changing what login costs.
+    rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds).hash(STUDENT_PASSWORD)
+    _insert_batches(database.users, (
+        {
+            "_id": _object_id(rng),
+            "name": f"Student {i}",
+            "email": student_email(i),
+            "password": password_hash,
+            "profileImage": None,
+            "role": "student",
+        }
+        for i in range(students)
+    ))
+
+    start = datetime(2025, 1, 6)
+    task_docs = [
+        {
+            "_id": _object_id(rng),
+            "title": f"Task {i + 1}",
+            "description": f"Benchmark task {i + 1}",
+            "videoUrl": None,
+            "dueDate": (start + timedelta(days=i)).strftime("%Y-%m-%d"),
+            "estimatedTime": "2h",
+            "instructions": "Upload your solution.",
+            "isLocked": i % 5 != 0,
+            "isCompleted": False,
+        }
+        for i in range(tasks)
+    ]
+    database.tasks.insert_many(task_docs)
+
+    # Distinct file bodies shared through content-addressed blobs, the way
+    # deduplicated uploads are stored.
+    bucket = GridFSBucket(database, bucket_name="submission_files", chunk_size_bytes=1024 * 1024)
+    blobs = []
+    for i in range(files):
+        body = _file_body(rng, _file_size(rng))
+        file_id = bucket.upload_from_stream(f"file-{i}", body)
+        blobs.append({
+            "_id": hashlib.sha256(body).hexdigest(),
+            "fileId": str(file_id),
+            "fileStore": "gridfs",
+            "size": len(body),
+            "storedSize": len(body),
+            "encoding": None,
+            "refCount": 0,
+            "createdAt": start,
+        })
+
+    submission_ids = []
+
+    def submission_docs():
+        for i in range(submissions):
+            task = rng.choice(task_docs)
+            student = rng.randrange(students)
+            blob = blobs[rng.randrange(len(blobs))]
+            blob["refCount"] += 1
+            graded = rng.random() < 0.7
+            doc_id = _object_id(rng)
+            if i % 100 == 0:
+                submission_ids.append(str(doc_id))
+            yield {
+                "_id": doc_id,
+                "taskId": str(task["_id"]),
+                "taskTitle": task["title"],
+                "studentId": student_email(student),
+                "studentName": f"Student {student}",
+                "studentImage": None,
+                "submissionDate": start + timedelta(seconds=rng.randrange(200 * 86400)),
+                "fileName": f"solution-{i}.{rng.choice(('py', 'pdf', 'docx', 'txt', 'zip'))}",
+                "fileSize": blob["size"],
+                "fileId": blob["fileId"],
+                "fileStore": "gridfs",
+                "fileHash": blob["_id"],
+                "fileEncoding": None,
+                "storedSize": blob["storedSize"],
+                "status": "graded" if graded else "pending",
+                "grade": rng.choice("ABCDF") if graded else None,
+                "feedback": "Reviewed" if graded else None,
+            }
+
+    _insert_batches(database.submissions, submission_docs())
+    database.blobs.insert_many(blobs)
+    # The rollups the write paths would have kept current; same pipeline as
+    # rebuild_task_stats(), on this synchronous client
+    for _ in database.submissions.aggregate(TASK_STATS_PIPELINE):
+        pass
+
+    return {
+        "task_ids": [str(task["_id"]) for task in task_docs],
+        "students": students,
+        "submission_ids": submission_ids,
+    }
+
+
+def sample_existing(database, limit: int = 5000) -> dict:
+    # Scenario inputs for a database seeded by an earlier run
+    return {
+        "task_ids": [str(doc["_id"]) for doc in database.tasks.find({}, {"_id": 1})],
+        "students": database.users.count_documents({"role": "student"}),
+        "submission_ids": [
+            str(doc["_id"]) for doc in database.submissions.find({"fileId": {"$ne": None}}, {"_id": 1}).limit(limit)
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a MongoDB database for benchmarks")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--submissions", type=int, default=500_000)
+    parser.add_argument("--files", type=int, default=500, help="distinct file bodies shared by submissions")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    client = MongoClient(args.mongo_uri)
+    seed(client[DATABASE_NAME], args.tasks, args.students, args.submissions, args.files, args.seed)
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,91 @@
+# Serialization micro-benchmark: documents per second for the /submissions
+# listing, comparing the original path (submission_helper, then FastAPI's
+# response_model validation and json encoding) with the fast path (documents
+# already shaped by SUBMISSION_RESPONSE_PROJECTION, encoded with orjson).
+#
+# Runs offline, no MongoDB needed:
+#   python benchmarks/serialization_bench.py --docs 100000
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import SubmissionResponse  # noqa: E402
+from serializers import submission_helper  # noqa: E402
+
+
+def make_raw_docs(count: int) -> list:
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "taskId": str(ObjectId()),
+            "taskTitle": f"Task {i % 200}",
+            "studentId": f"student{i % 50000}@example.com",
+            "studentName": f"Student {i % 50000}",
+            "studentImage": None,
+            "submissionDate": start + timedelta(seconds=i),
+            "fileName": f"report-{i}.pdf",
+            "fileSize": 250_000 + i,
+            "status": "graded" if i % 3 else "pending",
+            "grade": "A" if i % 3 else None,
+            "feedback": "Well done" if i % 3 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def make_projected_docs(raw_docs: list) -> list:
+    # What the server returns for SUBMISSION_RESPONSE_PROJECTION
+    return [
+        {
+            "id": str(doc["_id"]),
+            **{k: v for k, v in doc.items() if k not in ("_id", "submissionDate")},
+            "submissionDate": doc["submissionDate"].strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        }
+        for doc in raw_docs
+    ]
+
+
+def helper_path(raw_docs: list) -> bytes:
+    submissions = [submission_helper(doc) for doc in raw_docs]
+    validated = TypeAdapter(List[SubmissionResponse]).validate_python(submissions)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(projected_docs: list) -> bytes:
+    return orjson.dumps(projected_docs)
+
+
+def measure(label: str, fn, docs: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - started)
+    rate = len(docs) / best
+    print(f"{label:<34} {rate:>12,.0f} docs/s  ({best * 1000:.1f} ms for {len(docs):,} docs)")
+    return rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Submission listing serialization benchmark")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = make_raw_docs(args.docs)
+    projected = make_projected_docs(raw)
+    slow = measure("helper + response_model + json", helper_path, raw, args.rounds)
+    fast = measure("projected + orjson", fast_path, projected, args.rounds)
+    print(f"speedup: {fast / slow:.1f}x")
@@ -0,0 +1,143 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from compression import choose_encoding, compress_chunks
+from database import blobs_repo
+from storage import get_file_store, read_upload
+
+# Content-addressed file bodies. Each unique body is stored once and tracked
+# by a document in the `blobs` collection keyed by its SHA-256:
+#   fileId, fileStore - where the body lives in the file store
+#   size              - original body size in bytes
+#   encoding          - compression applied in the store (None if stored raw)
+#   storedSize        - bytes actually held by the file store
+#   refCount          - number of submissions pointing at this body
+# Submissions carry the hash as `fileHash` alongside a copy of the location,
+# encoding and sizes, so downloads never need to visit the blobs collection.
+
+
+@dataclass
+class StoredBlob:
+    hash: str
+    file_id: str
+    store: str
+    size: int
+    stored_size: int
+    encoding: Optional[str] = None
+
+
+async def _hash_upload(upload: UploadFile) -> Tuple[str, bytes]:
+    # The upload is already spooled by the time the handler runs, so hashing
+    # it first is a local read; the file store is only written for new bodies.
+    # Returns the hash and the first chunk, used as the compressibility probe.
+    digest = hashlib.sha256()
+    sample = b""
+    await upload.seek(0)
+    async for chunk in read_upload(upload):
+        sample = sample or chunk
+        digest.update(chunk)
+    await upload.seek(0)
+    return digest.hexdigest(), sample
+
+
+async def _acquire(file_hash: str):
+    return await blobs_repo.find_one_and_update(
+        {"_id": file_hash},
+        {"$inc": {"refCount": 1}},
+        projection={"fileId": 1, "fileStore": 1, "size": 1, "storedSize": 1, "encoding": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _stored_blob(blob: dict) -> StoredBlob:
+    return StoredBlob(
+        hash=blob["_id"],
+        file_id=blob["fileId"],
+        store=blob["fileStore"],
+        size=blob["size"],
+        stored_size=blob.get("storedSize", blob["size"]),
+        encoding=blob.get("encoding"),
+    )
+
+
+async def store_upload(upload: UploadFile) -> StoredBlob:
+    # Takes one reference on the blob holding this upload's body, writing the
+    # body to the file store only if no identical one exists yet.
+    file_hash, sample = await _hash_upload(upload)
+    blob = await _acquire(file_hash)
+    if blob:
+        return _stored_blob(blob)
+
+    file_store = get_file_store()
+    encoding = choose_encoding(sample)
+    size = 0
+
+    async def counted(chunks):
+        nonlocal size
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+
+    stored_file = await file_store.save(
+        compress_chunks(counted(read_upload(upload)), encoding),
+        upload.filename or "upload",
+        upload.content_type
+    )
+    blob = {
+        "_id": file_hash,
+        "fileId": stored_file.id,
+        "fileStore": file_store.name,
+        "size": size,
+        "storedSize": stored_file.size,
+        "encoding": encoding,
+        "refCount": 1,
+        "createdAt": datetime.utcnow(),
+    }
+    try:
+        await blobs_repo.insert_one(blob)
+    except DuplicateKeyError:
+        # A concurrent upload of the same body won the race; use its copy
+        await file_store.delete(stored_file.id)
+        blob = await _acquire(file_hash)
+        if not blob:
+            # ...and it was released again in the meantime
+            return await store_upload(upload)
+        return _stored_blob(blob)
+    except BaseException:
+        await file_store.delete(stored_file.id)
+        raise
+    return _stored_blob(blob)
+
+
+async def release_blob(file_hash: str) -> None:
+    # Drops one reference; the last one out deletes the blob and its body.
+    blob = await blobs_repo.find_one_and_update(
+        {"_id": file_hash},
+        {"$inc": {"refCount": -1}},
+        projection={"refCount": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not blob or blob["refCount"] > 0:
+        return
+    # Conditional on the count still being zero, so a concurrent upload that
+    # re-acquired the blob in between keeps it alive.
+    orphan = await blobs_repo.find_one_and_delete(
+        {"_id": file_hash, "refCount": {"$lte": 0}},
+        projection={"fileId": 1, "fileStore": 1}
+    )
+    if orphan:
+        await get_file_store(orphan["fileStore"]).delete(orphan["fileId"])
+
+
+async def release_submission_file(submission: dict) -> None:
+    if submission.get("fileHash"):
+        await release_blob(submission["fileHash"])
+    elif submission.get("fileId"):
+        # Files stored before deduplication belong to a single submission
+        await get_file_store(submission.get("fileStore", "gridfs")).delete(submission["fileId"])
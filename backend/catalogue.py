@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+from database import meta_repo, tasks_repo
+from serializers import task_helper
+
+# How long a worker trusts its cached catalogue before re-reading the shared
+# version document. Writes made by this worker invalidate immediately; writes
+# made by other workers become visible within this interval.
+VERSION_CHECK_SECONDS = float(os.getenv("CATALOGUE_VERSION_CHECK_SECONDS", "1.0"))
+_VERSION_DOC_ID = "tasks"
+
+
+def _encode(payload) -> Tuple[bytes, str]:
+    body = orjson.dumps(payload)
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class TaskCatalogue:
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.tasks: list = []
+        self.body: bytes = b"[]"
+        self.etag: str = ""
+        # task id -> (serialized task, ETag)
+        self.by_id: Dict[str, Tuple[bytes, str]] = {}
+        # task id -> task as returned by task_helper
+        self.tasks_by_id: Dict[str, dict] = {}
+        # Locked tasks in unlock order, (dueDate, id)
+        self.locked_tasks: list = []
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _current_version(self) -> int:
+        doc = await meta_repo.find_one({"_id": _VERSION_DOC_ID}, {"version": 1})
+        return doc["version"] if doc else 0
+
+    async def _reload(self, version: int) -> None:
+        tasks = [task_helper(doc) async for doc in tasks_repo.find()]
+        self.tasks = tasks
+        self.body, self.etag = _encode(tasks)
+        self.by_id = {task["id"]: _encode(task) for task in tasks}
+        self.tasks_by_id = {task["id"]: task for task in tasks}
+        self.locked_tasks = sorted((task for task in tasks if task["isLocked"]), key=lambda task: (task["dueDate"], task["id"]))
+        self.version = version
+
+    async def get(self, force_check: bool = False) -> "TaskCatalogue":
+        # Read-through: serve from memory unless the check interval elapsed
+        if not force_check and self.version is not None and time.monotonic() - self._checked_at < VERSION_CHECK_SECONDS:
+            return self
+        async with self._lock:
+            if not force_check and self.version is not None and time.monotonic() - self._checked_at < VERSION_CHECK_SECONDS:
+                return self
+            version = await self._current_version()
+            if version != self.version:
+                await self._reload(version)
+            self._checked_at = time.monotonic()
+        return self
+
+    async def get_task(self, task_id: str) -> Optional[Tuple[bytes, str]]:
+        catalogue = await self.get()
+        entry = catalogue.by_id.get(task_id)
+        if entry is None:
+            # The task may have been created by another worker since the last check
+            entry = (await self.get(force_check=True)).by_id.get(task_id)
+        return entry
+
+    async def get_task_doc(self, task_id: str) -> Optional[dict]:
+        catalogue = await self.get()
+        task = catalogue.tasks_by_id.get(task_id)
+        if task is None:
+            task = (await self.get(force_check=True)).tasks_by_id.get(task_id)
+        return task
+
+    async def invalidate(self) -> None:
+        # Bump the shared version so every worker reloads on its next check
+        await meta_repo.update_one({"_id": _VERSION_DOC_ID}, {"$inc": {"version": 1}}, upsert=True)
+        self._checked_at = 0.0
+
+
+task_catalogue = TaskCatalogue()
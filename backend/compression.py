@@ -0,0 +1,141 @@
+import asyncio
+import os
+import zlib
+from typing import AsyncIterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available, zstd only when installed
+    zstandard = None
+
+# Stored bodies are compressed per file: a quick probe on the first chunk
+# decides whether compression pays off, so already-compressed formats (PDF,
+# DOCX, images, archives) are stored as-is and text and code are shrunk.
+# Encodings use their HTTP Content-Encoding names, so a stored body can be
+# sent to a client that accepts it without being decoded first.
+ZSTD = "zstd"
+DEFLATE = "deflate"  # zlib stream, which is what HTTP calls "deflate"
+
+STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "auto")  # "auto", "zstd", "deflate" or "off"
+ZSTD_LEVEL = int(os.getenv("STORAGE_ZSTD_LEVEL", "3"))
+DEFLATE_LEVEL = int(os.getenv("STORAGE_DEFLATE_LEVEL", "6"))
+PROBE_BYTES = 64 * 1024
+# Compress only when the probe shrinks to at most this fraction of its size
+PROBE_MAX_RATIO = float(os.getenv("STORAGE_COMPRESSION_MAX_RATIO", "0.9"))
+
+
+def _preferred_encoding() -> Optional[str]:
+    if STORAGE_COMPRESSION == "off":
+        return None
+    if STORAGE_COMPRESSION == DEFLATE or zstandard is None:
+        return DEFLATE
+    return ZSTD
+
+
+def choose_encoding(sample: bytes) -> Optional[str]:
+    encoding = _preferred_encoding()
+    if encoding is None or not sample:
+        return None
+    sample = sample[:PROBE_BYTES]
+    # Fast zlib level 1 is a cheap stand-in for either codec's ratio
+    if len(zlib.compress(sample, 1)) > len(sample) * PROBE_MAX_RATIO:
+        return None
+    return encoding
+
+
+def _compressor(encoding: str):
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(DEFLATE_LEVEL)
+
+
+async def compress_chunks(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    if encoding is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    compressor = _compressor(encoding)
+    async for chunk in chunks:
+        # Both codecs release the GIL, so compression runs in a worker thread
+        data = await asyncio.to_thread(compressor.compress, chunk)
+        if data:
+            yield data
+    data = compressor.flush()
+    if data:
+        yield data
+
+
+class _ChunkSource:
+    # Blocking file-like view of an async chunk iterator, for zstandard's
+    # stream_reader, which pulls its input. read() is only called from a
+    # worker thread and fetches each chunk on the event loop.
+    def __init__(self, chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._buffer = b""
+        self._exhausted = False
+
+    async def _next_chunk(self) -> bytes:
+        return await self._chunks.__anext__()
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._buffer and not self._exhausted:
+            try:
+                self._buffer = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            except StopAsyncIteration:
+                self._exhausted = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+async def _zstd_decoded(chunks: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to read zstd-compressed files")
+    source = _ChunkSource(chunks, asyncio.get_running_loop())
+    reader = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True)
+    while data := await asyncio.to_thread(reader.read, chunk_size):
+        yield data
+
+
+async def _deflate_decoded(chunks: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj()
+    async for chunk in chunks:
+        # Drains the chunk a bounded piece at a time; a full piece may leave
+        # output buffered even with no input left, so keep asking until short.
+        while True:
+            data = await asyncio.to_thread(decompressor.decompress, chunk, chunk_size)
+            chunk = decompressor.unconsumed_tail
+            if data:
+                yield data
+            if not chunk and len(data) < chunk_size:
+                break
+
+
+async def decompress_chunks(
+    chunks: AsyncIterator[bytes], encoding: Optional[str], start: int = 0, end: Optional[int] = None,
+    chunk_size: int = 1024 * 1024
+) -> AsyncIterator[bytes]:
+    # Yields bytes [start, end) of the decoded body in pieces of at most
+    # chunk_size, however well the body compressed. Compressed streams cannot
+    # seek, so a range is served by decoding and discarding the prefix.
+    position = 0
+    if encoding == ZSTD:
+        decoded = _zstd_decoded(chunks, chunk_size)
+    elif encoding:
+        decoded = _deflate_decoded(chunks, chunk_size)
+    else:
+        decoded = chunks
+    async for chunk in decoded:
+        chunk_start, chunk_end = position, position + len(chunk)
+        position = chunk_end
+        if chunk_end <= start:
+            continue
+        chunk = chunk[max(start - chunk_start, 0):]
+        if end is not None and chunk_end > end:
+            chunk = chunk[:len(chunk) - (chunk_end - end)]
+        if chunk:
+            yield chunk
+        if end is not None and chunk_end >= end:
+            break
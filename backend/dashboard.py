@@ -0,0 +1,53 @@
+from database import tasks_repo
+from serializers import SUBMISSION_LIST_PROJECTION, submission_helper, task_helper
+
+
+def student_dashboard_pipeline(student_id: str) -> list:
+    return [
+        {"$sort": {"dueDate": 1, "_id": 1}},
+        {"$addFields": {"taskIdStr": {"$toString": "$_id"}}},
+        # Latest submission by this student for each task, served by the
+        # (taskId, studentId, submissionDate) index. localField combined with a
+        # sub-pipeline needs MongoDB 5.0+.
+        {"$lookup": {
+            "from": "submissions",
+            "localField": "taskIdStr",
+            "foreignField": "taskId",
+            "pipeline": [
+                {"$match": {"studentId": student_id}},
+                {"$sort": {"submissionDate": -1, "_id": -1}},
+                {"$limit": 1},
+                {"$project": SUBMISSION_LIST_PROJECTION},
+            ],
+            "as": "latestSubmission",
+        }},
+        # Uncorrelated lookup: the server runs it once and reuses the result
+        {"$lookup": {
+            "from": "progress",
+            "pipeline": [{"$match": {"_id": student_id}}],
+            "as": "progress",
+        }},
+        {"$addFields": {
+            "unlockedTaskIds": {"$ifNull": [{"$arrayElemAt": ["$progress.unlockedTaskIds", 0]}, []]},
+            "completedTaskIds": {"$ifNull": [{"$arrayElemAt": ["$progress.completedTaskIds", 0]}, []]},
+        }},
+        {"$project": {
+            "title": 1, "description": 1, "videoUrl": 1, "dueDate": 1, "estimatedTime": 1, "instructions": 1,
+            "isLocked": {"$and": [
+                {"$ifNull": ["$isLocked", False]},
+                {"$not": [{"$in": ["$taskIdStr", "$unlockedTaskIds"]}]},
+            ]},
+            "isCompleted": {"$in": ["$taskIdStr", "$completedTaskIds"]},
+            "latestSubmission": {"$arrayElemAt": ["$latestSubmission", 0]},
+        }},
+    ]
+
+
+async def get_student_dashboard(student_id: str) -> dict:
+    tasks = []
+    async for doc in tasks_repo.aggregate(student_dashboard_pipeline(student_id)):
+        task = task_helper(doc)
+        latest = doc.get("latestSubmission")
+        task["latestSubmission"] = submission_helper(latest) if latest else None
+        tasks.append(task)
+    return {"studentId": student_id, "tasks": tasks}
@@ -1,9 +1,75 @@
+import asyncio
 import os
-from pymongo import MongoClient
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
 from dotenv import load_dotenv
+from repository import Repository
+from observability import MongoCommandMetrics
 
 load_dotenv()
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["eduquest"]
-users_collection = db["users"]
-tasks_collection = db["tasks"]
+DATABASE_NAME = "eduquest"
+# Connections opened up front by warm_up(), so the first requests after a
+# deploy do not each pay for a TCP/TLS handshake and authentication.
+MONGO_WARM_CONNECTIONS = int(os.getenv("MONGO_WARM_CONNECTIONS", "4"))
+
+
+class MongoResources:
+    # The client is created on first use in the process that uses it, never
+    # at import time, so a server that imports the app and then forks workers
+    # (gunicorn --preload, uvicorn --workers) gives each worker its own client
+    # and its own pool. Pool settings are therefore per worker.
+    def __init__(self):
+        self.client: Optional[AsyncMongoClient] = None
+        self.db: Optional[AsyncDatabase] = None
+        self._pid: Optional[int] = None
+
+    def open(self) -> AsyncDatabase:
+        if self.client is None or self._pid != os.getpid():
+            # Pool sizing and timeouts are explicit so a slow or unreachable
+            # cluster fails requests quickly instead of queueing them indefinitely.
+            self.client = AsyncMongoClient(
+                os.getenv("MONGO_URI"),
+                maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+                minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+                connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+                serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+                socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000")),
+                waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+                event_listeners=[MongoCommandMetrics()],
+            )
+            self.db = self.client[DATABASE_NAME]
+            self._pid = os.getpid()
+        return self.db
+
+    async def warm_up(self) -> None:
+        # Concurrent pings make the pool open several connections at once
+        database = self.open()
+        await asyncio.gather(*[database.command("ping") for _ in range(max(MONGO_WARM_CONNECTIONS, 1))])
+
+    async def ping(self) -> None:
+        await self.open().command("ping")
+
+    async def close(self) -> None:
+        if self.client is not None and self._pid == os.getpid():
+            await self.client.close()
+        self.client = None
+        self.db = None
+        self._pid = None
+
+
+mongo = MongoResources()
+
+
+def get_db() -> AsyncDatabase:
+    return mongo.open()
+
+
+users_repo = Repository("users", get_db)
+tasks_repo = Repository("tasks", get_db)
+submissions_repo = Repository("submissions", get_db)
+progress_repo = Repository("progress", get_db)
+meta_repo = Repository("meta", get_db)
+blobs_repo = Repository("blobs", get_db)
+task_stats_repo = Repository("task_stats", get_db)
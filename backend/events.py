@@ -0,0 +1,234 @@
+import asyncio
+import os
+from typing import AsyncIterator, Iterable, Optional, Set
+
+import orjson
+from fastapi import Request
+from pymongo.errors import PyMongoError
+
+from observability import logger
+
+# Change events pushed to clients over Server-Sent Events. Each event goes to
+# one or more topics:
+#   "student:<email>" - a student's own submissions, grades and unlocks
+#   "task:<id>"       - submissions for one task (teacher views)
+#   "tasks"           - catalogue changes, delivered to every subscriber
+#   "submissions"     - every submission change (teacher overview)
+#
+# EVENT_SOURCE picks where events come from:
+#   "local"         - the write paths of this process publish directly
+#                     (single worker, or workers behind sticky sessions)
+#   "change_stream" - a background task follows MongoDB change streams, so
+#                     every worker sees every write (needs a replica set)
+EVENT_SOURCE = os.getenv("EVENT_SOURCE", "local")
+# Events buffered per subscriber before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "100"))
+HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+_RETRY_MS = 5000
+_RESYNC = {"type": "resync"}
+_CLOSE = None
+
+
+def student_topic(student_id: str) -> str:
+    return f"student:{student_id}"
+
+
+def task_topic(task_id: str) -> str:
+    return f"task:{task_id}"
+
+
+TASKS_TOPIC = "tasks"
+SUBMISSIONS_TOPIC = "submissions"
+
+
+class Subscription:
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, event: Optional[dict]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A subscriber this far behind has missed too much to catch up
+            # incrementally: drop its backlog and ask it to refetch.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC if event is not _CLOSE else _CLOSE)
+
+
+class EventHub:
+    # In-process fan-out. Publishing never blocks: events are handed to each
+    # matching subscriber's bounded queue, so an idle subscriber costs one
+    # queue and one suspended coroutine.
+    def __init__(self):
+        self._topics = {}
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(set(topics) | {TASKS_TOPIC})
+        for topic in subscription.topics:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, event: dict, topics: Iterable[str]) -> None:
+        recipients = set()
+        for topic in topics:
+            recipients.update(self._topics.get(topic, ()))
+        for subscription in recipients:
+            subscription.offer(event)
+
+    def close(self) -> None:
+        # Ends every open stream so shutdown does not wait on idle clients
+        for subscription in {s for subscribers in self._topics.values() for s in subscribers}:
+            subscription.offer(_CLOSE)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({s for subscribers in self._topics.values() for s in subscribers})
+
+
+event_hub = EventHub()
+
+
+# --- events emitted by the write paths ---------------------------------------
+
+def _emit(event: dict, topics: Iterable[str]) -> None:
+    # With the change stream as the source, the follower publishes instead
+    if EVENT_SOURCE == "local":
+        event_hub.publish(event, topics)
+
+
+def _submission_event(event_type: str, submission: dict) -> dict:
+    event = {
+        "type": event_type,
+        "submissionId": str(submission.get("_id") or submission.get("id")),
+        "taskId": submission.get("taskId"),
+        "studentId": submission.get("studentId"),
+    }
+    for field in ("status", "grade", "feedback", "fileName", "fileSize"):
+        if field in submission:
+            event[field] = submission[field]
+    return event
+
+
+def _submission_topics(submission: dict) -> list:
+    return [student_topic(submission.get("studentId")), task_topic(submission.get("taskId")), SUBMISSIONS_TOPIC]
+
+
+def submission_changed(event_type: str, submission: dict) -> None:
+    # event_type: submission.created, submission.replaced, submission.graded
+    # or submission.deleted
+    _emit(_submission_event(event_type, submission), _submission_topics(submission))
+
+
+def task_changed(event_type: str, task_id: str) -> None:
+    # event_type: task.created, task.updated or task.deleted; clients refetch
+    # the task, which the catalogue cache serves cheaply.
+    _emit({"type": event_type, "taskId": task_id}, [TASKS_TOPIC])
+
+
+def tasks_unlocked(student_id: str, task_ids: list) -> None:
+    if task_ids:
+        _emit({"type": "task.unlocked", "studentId": student_id, "taskIds": task_ids}, [student_topic(student_id)])
+
+
+# --- change stream follower --------------------------------------------------
+
+def _from_submission_change(change: dict) -> Optional[tuple]:
+    operation = change["operationType"]
+    document = change.get("fullDocument")
+    if operation == "insert":
+        event_type = "submission.created"
+    elif operation in ("update", "replace") and document:
+        # Replacements reset the status to pending; grading sets it to graded
+        event_type = "submission.graded" if document.get("status") == "graded" else "submission.replaced"
+    else:
+        # Deletes carry only the _id, not the owner or task to route by
+        return None
+    return _submission_event(event_type, document), _submission_topics(document)
+
+
+def _from_task_change(change: dict) -> Optional[tuple]:
+    event_type = {"insert": "task.created", "update": "task.updated", "replace": "task.updated",
+                  "delete": "task.deleted"}.get(change["operationType"])
+    if event_type is None:
+        return None
+    return {"type": event_type, "taskId": str(change["documentKey"]["_id"])}, [TASKS_TOPIC]
+
+
+def _from_progress_change(change: dict) -> Optional[tuple]:
+    document = change.get("fullDocument")
+    updated = change.get("updateDescription", {}).get("updatedFields", {})
+    if not document or (change["operationType"] == "update" and not any(k.startswith("unlockedTaskIds") for k in updated)):
+        return None
+    # The change does not say which ids were added; clients merge the full set
+    student_id = document["_id"]
+    return (
+        {"type": "task.unlocked", "studentId": student_id, "taskIds": document.get("unlockedTaskIds", [])},
+        [student_topic(student_id)],
+    )
+
+
+_CHANGE_HANDLERS = {
+    "submissions": _from_submission_change,
+    "tasks": _from_task_change,
+    "progress": _from_progress_change,
+}
+
+
+async def follow_change_stream(database) -> None:
+    # Runs for the life of the process, resuming after errors from the last
+    # seen resume token.
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": list(_CHANGE_HANDLERS)},
+        "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+    }}]
+    resume_token = None
+    while True:
+        try:
+            async with await database.watch(
+                pipeline, full_document="updateLookup", resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    converted = _CHANGE_HANDLERS[change["ns"]["coll"]](change)
+                    if converted:
+                        event_hub.publish(*converted)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError:
+            logger.exception("change stream interrupted, resuming")
+            await asyncio.sleep(1)
+
+
+# --- SSE framing ---------------------------------------------------------------
+
+def _frame(event: dict) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+
+async def stream_events(request: Request, subscription: Subscription) -> AsyncIterator[bytes]:
+    try:
+        yield f"retry: {_RETRY_MS}\n\n".encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                # Comment line: keeps proxies from timing out idle streams
+                yield b": ping\n\n"
+                continue
+            if event is _CLOSE:
+                return
+            yield _frame(event)
+    finally:
+        event_hub.unsubscribe(subscription)
@@ -0,0 +1,42 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Declarative index registry, keyed by collection name. ensure_indexes() is
+# run at startup; create_indexes is a no-op for indexes that already exist,
+# so applying the registry repeatedly is safe.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "tasks": [
+        # Catalogue order, as the dashboard aggregation sorts tasks
+        IndexModel([("dueDate", ASCENDING), ("_id", ASCENDING)], name="dueDate_id"),
+    ],
+    "submissions": [
+        # Task page / per-task listings: {taskId, studentId} sorted by newest first
+        IndexModel(
+            [("taskId", ASCENDING), ("studentId", ASCENDING), ("submissionDate", DESCENDING), ("_id", DESCENDING)],
+            name="task_student_date",
+        ),
+        # Student history and progression lookups
+        IndexModel(
+            [("studentId", ASCENDING), ("submissionDate", DESCENDING), ("_id", DESCENDING)],
+            name="student_date",
+        ),
+        IndexModel(
+            [("studentId", ASCENDING), ("status", ASCENDING), ("grade", ASCENDING)],
+            name="student_status_grade",
+        ),
+        # Unfiltered and status-filtered keyset pagination
+        IndexModel([("submissionDate", DESCENDING), ("_id", DESCENDING)], name="date"),
+        IndexModel(
+            [("status", ASCENDING), ("submissionDate", DESCENDING), ("_id", DESCENDING)],
+            name="status_date",
+        ),
+    ],
+}
+
+
+async def ensure_indexes(database) -> None:
+    for collection_name, index_models in INDEXES.items():
+        await database[collection_name].create_indexes(index_models)
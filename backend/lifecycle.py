@@ -0,0 +1,68 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+from typing import Optional
+
+from events import event_hub
+from observability import logger
+
+# Time /readyz waits for a database ping before reporting not ready
+READY_PING_TIMEOUT_SECONDS = float(os.getenv("READY_PING_TIMEOUT_SECONDS", "1.0"))
+
+
+class Lifecycle:
+    # Worker state behind /readyz: not ready until warm-up has finished, and
+    # not ready again as soon as shutdown begins, so load balancers stop
+    # routing to a worker before it stops serving.
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.warmup_seconds: Optional[float] = None
+
+    def mark_ready(self, warmup_seconds: float) -> None:
+        self.ready = True
+        self.warmup_seconds = warmup_seconds
+        logger.info("worker ready", extra={"fields": {"pid": os.getpid(), "warmup_ms": round(warmup_seconds * 1000, 1)}})
+
+    def begin_drain(self) -> None:
+        if self.draining:
+            return
+        self.draining = True
+        self.ready = False
+        # Open event streams would otherwise hold the server's graceful
+        # shutdown until its timeout; clients reconnect to another worker.
+        event_hub.close()
+        logger.info("worker draining", extra={"fields": {"pid": os.getpid()}})
+
+
+lifecycle = Lifecycle()
+
+
+def install_drain_handlers() -> None:
+    # Chains onto the server's own SIGTERM/SIGINT handlers so draining starts
+    # when the signal arrives, before the server waits for open connections,
+    # rather than in lifespan shutdown, which only runs after that wait.
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            # Default or ignored: the server does not manage this signal
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(lifecycle.begin_drain)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+async def warm_up_step(label: str, coro) -> None:
+    started = time.perf_counter()
+    await coro
+    logger.info("warm-up step finished", extra={"fields": {
+        "step": label, "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+    }})
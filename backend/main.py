@@ -1,71 +1,133 @@
-from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Form, Response, Query
+from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Form, Response, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
 from models import (
     UserSignup, UserLogin, 
     TaskCreate, TaskUpdate, TaskResponse,
-    SubmissionCreate, SubmissionUpdate, SubmissionResponse
+    SubmissionCreate, SubmissionUpdate, SubmissionResponse,
+    StudentProgressResponse, StudentDashboardResponse, TaskStatsResponse,
+    BulkGradeRequest, BulkGradeResponse
 )
-from database import users_collection, tasks_collection, db
-from auth import hash_password, verify_password, create_token
+from database import mongo, users_repo, tasks_repo, submissions_repo
+from indexes import ensure_indexes
+from auth import (
+    Principal, cache_profile, create_token, get_current_principal, get_stream_principal,
+    hash_password_async, shutdown_hash_executor, verify_and_update_password
+)
+from lifecycle import READY_PING_TIMEOUT_SECONDS, install_drain_handlers, lifecycle, warm_up_step
+from storage import get_file_store, iter_file_body
+from uploads import UploadAdmissionMiddleware
+from blobs import release_blob, release_submission_file, store_upload
+from catalogue import task_catalogue
+from dashboard import get_student_dashboard
+from archive import stream_submissions_zip
+from serializers import (
+    SUBMISSION_LIST_PROJECTION, SUBMISSION_RESPONSE_PROJECTION,
+    json_response, stream_json_array, submission_helper, task_helper
+)
+from task_stats import (
+    TASK_STATS_FIELDS, get_all_task_stats, record_submission_change, record_submission_changes
+)
+from progress import PASSING_GRADES, get_progress, record_completion, record_completions_many
+from events import (
+    EVENT_SOURCE, SUBMISSIONS_TOPIC, event_hub, follow_change_stream, stream_events, student_topic,
+    submission_changed, task_changed, task_topic
+)
+from observability import (
+    RequestMetricsMiddleware, configure_logging, logger, metrics_response, release_worker_metrics, shutdown_logging
+)
+from http_helpers import accepts_encoding, cached_json_response, http_date, is_not_modified, parse_range
 from bson import ObjectId
-from typing import List, Optional
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import Awaitable, List, Optional
+import asyncio
+import base64
+from contextlib import asynccontextmanager
 import os
 import shutil
+import time
 from datetime import datetime
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in each worker after fork: every process-bound resource (database
+    # client, thread pools, log listener) is created here, and the worker
+    # only reports ready once connections, indexes and caches are warm.
+    started = time.perf_counter()
+    configure_logging()
+    database = mongo.open()
+    await warm_up_step("connections", mongo.warm_up())
+    await warm_up_step("indexes", ensure_indexes(database))
+    await warm_up_step("task_catalogue", task_catalogue.get(force_check=True))
+    follower = asyncio.create_task(follow_change_stream(database)) if EVENT_SOURCE == "change_stream" else None
+    install_drain_handlers()
+    lifecycle.mark_ready(time.perf_counter() - started)
+    yield
+    # The server has stopped accepting and waited for in-flight requests
+    lifecycle.begin_drain()
+    if follower:
+        follower.cancel()
+        await asyncio.gather(follower, return_exceptions=True)
+    await asyncio.to_thread(shutdown_hash_executor)
+    await mongo.close()
+    shutdown_logging()
+    release_worker_metrics()
+
+app = FastAPI(lifespan=lifespan)
 
+# Innermost, so its 413/503 rejections still get CORS headers and metrics
+app.add_middleware(UploadAdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
+# Outermost, so request timing covers every other middleware
+app.add_middleware(RequestMetricsMiddleware)
 
-# Initialize submissions collection
-submissions_collection = db["submissions"]
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
 
-# Helper function to convert MongoDB document to TaskResponse
-def task_helper(task) -> dict:
-    return {
-        "id": str(task["_id"]),
-        "title": task["title"],
-        "description": task["description"],
-        "videoUrl": task.get("videoUrl"),
-        "dueDate": task["dueDate"],
-        "estimatedTime": task.get("estimatedTime"),
-        "instructions": task.get("instructions"),
-        "isLocked": task.get("isLocked", False),
-        "isCompleted": task.get("isCompleted", False),
-    }
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is up and its event loop is responsive
+    return {"status": "ok"}
 
-# Helper function to convert MongoDB document to SubmissionResponse
-def submission_helper(submission) -> dict:
-    return {
-        "id": str(submission["_id"]),
-        "taskId": submission["taskId"],
-        "taskTitle": submission["taskTitle"],
-        "studentId": submission["studentId"],
-        "studentName": submission["studentName"],
-        "studentImage": submission.get("studentImage"),
-        "submissionDate": submission["submissionDate"].isoformat() if isinstance(submission["submissionDate"], datetime) else submission["submissionDate"],
-        "fileName": submission["fileName"],
-        "fileSize": submission["fileSize"],
-        "status": submission["status"],
-        "grade": submission.get("grade"),
-        "feedback": submission.get("feedback"),
-    }
+@app.get("/readyz")
+async def readyz():
+    if not lifecycle.ready:
+        status = "draining" if lifecycle.draining else "starting"
+        return JSONResponse({"status": status}, status_code=503)
+    try:
+        await asyncio.wait_for(mongo.ping(), READY_PING_TIMEOUT_SECONDS)
+    except Exception:
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+    return {"status": "ready", "warmupSeconds": lifecycle.warmup_seconds}
+
+MAX_SUBMISSIONS_PAGE_SIZE = 500
+# Bulk gradings overlapping on one submission that still get exact rollups
+MAX_PENDING_GRADINGS = 16
+
+def encode_submission_cursor(submission) -> str:
+    # Takes a serialized submission (SubmissionResponse shape)
+    raw = f"{submission['submissionDate']}|{submission['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_submission_cursor(cursor: str):
+    try:
+        raw_date, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(raw_date), ObjectId(raw_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
 
 @app.post("/signup")
 async def signup(user: UserSignup, request: Request):
-    print(f"Request received at /signup from {request.client.host}")
-    print('Received signup request:', user.dict())  # Ensure user data is received
-    if users_collection.find_one({"email": user.email}):
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     user_data = {
         "name": user.name,
         "email": user.email,
@@ -73,25 +135,31 @@ async def signup(user: UserSignup, request: Request):
         "profileImage": user.profileImage if user.profileImage else None,
         "role": user.role,
     }
-    result = users_collection.insert_one(user_data)
-    print('Inserted user with ID:', result.inserted_id)  # Log MongoDB insertion
+    # The unique email index rejects duplicates, so no lookup is needed first
+    try:
+        inserted_id = await users_repo.insert_one(user_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    logger.info("user signed up", extra={"fields": {"user_id": str(inserted_id), "role": user.role}})
     return {"message": "Signup successful"}
 
 @app.post("/login")
 async def login(user: UserLogin, request: Request):
-    print(f"Request received at /login from {request.client.host}")
-    print('Received login request:', user.dict())  # Ensure user data is received
-    db_user = users_collection.find_one({"email": user.email})
-    print('User found in database:', db_user)
+    db_user = await users_repo.find_one({"email": user.email})
     if not db_user:
-        print('User not found in database')  # Debug log
+        logger.debug("login failed: unknown user")
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    if not verify_password(user.password, db_user["password"]):
-        print('Password verification failed')  # Debug log
+    password_ok, new_hash = await verify_and_update_password(user.password, db_user["password"])
+    if not password_ok:
+        logger.debug("login failed: wrong password")
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash used outdated bcrypt cost settings; upgrade it in place
+        await users_repo.update_one({"_id": db_user["_id"]}, {"$set": {"password": new_hash}})
     
     token = create_token({"sub": str(db_user["_id"]), "email": db_user["email"]})
-    print('Login successful for user:', db_user["email"])  # Debug log
+    # Warm the profile cache so the first authenticated request skips the lookup
+    cache_profile(db_user)
     return {
         "token": token,
         "profileImage": db_user["profileImage"],
@@ -102,35 +170,36 @@ async def login(user: UserLogin, request: Request):
 # Task Endpoints
 @app.post("/tasks", response_model=TaskResponse)
 async def create_task(task: TaskCreate, request: Request):
-    print(f"Request received at /tasks (POST) from {request.client.host}")
     task_data = task.model_dump()
-    result = tasks_collection.insert_one(task_data)
-    created_task = tasks_collection.find_one({"_id": result.inserted_id})
-    if created_task:
-        return task_helper(created_task)
-    raise HTTPException(status_code=500, detail="Failed to create task")
+    task_data["_id"] = await tasks_repo.insert_one(task_data)
+    await task_catalogue.invalidate()
+    task_changed("task.created", str(task_data["_id"]))
+    return task_helper(task_data)
 
 @app.get("/tasks", response_model=List[TaskResponse])
 async def get_all_tasks(request: Request):
-    print(f"Request received at /tasks (GET) from {request.client.host}")
-    tasks = []
-    for task_doc in tasks_collection.find():
-        tasks.append(task_helper(task_doc))
-    return tasks
+    # Served from the in-process catalogue cache as pre-serialized JSON
+    catalogue = await task_catalogue.get()
+    return cached_json_response(request, catalogue.body, catalogue.etag)
+
+# Declared before /tasks/{task_id} so "stats" is not taken for a task id
+@app.get("/tasks/stats", response_model=List[TaskStatsResponse])
+async def get_task_stats():
+    # Teacher analytics from the per-task rollups: O(tasks), not O(submissions)
+    return json_response(await get_all_task_stats())
 
 @app.get("/tasks/{task_id}", response_model=TaskResponse)
 async def get_task(task_id: str, request: Request):
-    print(f"Request received at /tasks/{task_id} (GET) from {request.client.host}")
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid Task ID format")
-    task_doc = tasks_collection.find_one({"_id": ObjectId(task_id)})
-    if task_doc:
-        return task_helper(task_doc)
+    cached_task = await task_catalogue.get_task(task_id)
+    if cached_task:
+        body, etag = cached_task
+        return cached_json_response(request, body, etag)
     raise HTTPException(status_code=404, detail=f"Task with id {task_id} not found")
 
 @app.put("/tasks/{task_id}", response_model=TaskResponse)
 async def update_task(task_id: str, task_update: TaskUpdate, request: Request):
-    print(f"Request received at /tasks/{task_id} (PUT) from {request.client.host}")
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid Task ID format")
     
@@ -138,63 +207,61 @@ async def update_task(task_id: str, task_update: TaskUpdate, request: Request):
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
 
-    result = tasks_collection.update_one(
+    updated_task_doc = await tasks_repo.find_one_and_update(
         {"_id": ObjectId(task_id)},
         {"$set": update_data}
     )
-    if result.matched_count == 0:
+    if not updated_task_doc:
         raise HTTPException(status_code=404, detail=f"Task with id {task_id} not found")
-    
-    updated_task_doc = tasks_collection.find_one({"_id": ObjectId(task_id)})
-    if updated_task_doc:
-        return task_helper(updated_task_doc)
-    raise HTTPException(status_code=500, detail="Failed to retrieve updated task")
+    await task_catalogue.invalidate()
+    task_changed("task.updated", task_id)
+    return task_helper(updated_task_doc)
 
 @app.delete("/tasks/{task_id}")
 async def delete_task(task_id: str, request: Request):
-    print(f"Request received at /tasks/{task_id} (DELETE) from {request.client.host}")
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid Task ID format")
-    result = tasks_collection.delete_one({"_id": ObjectId(task_id)})
+    result = await tasks_repo.delete_one({"_id": ObjectId(task_id)})
     if result.deleted_count == 1:
+        await task_catalogue.invalidate()
+        task_changed("task.deleted", task_id)
         return {"message": "Task deleted successfully"}
     raise HTTPException(status_code=404, detail=f"Task with id {task_id} not found")
 
 # Submission Endpoints
+async def after_commit(step: str, operation: Awaitable, submission_id) -> None:
+    # Follow-up work (rollups, unlocks, releasing a replaced file) for a
+    # submission write that is already committed. A failure is logged rather
+    # than raised: a 500 would make the client retry a write that succeeded.
+    try:
+        await operation
+    except Exception:
+        logger.exception(f"{step} failed after a committed submission write",
+                         extra={"fields": {"submission_id": str(submission_id)}})
+
 @app.post("/tasks/{task_id}/submit", response_model=SubmissionResponse)
 async def submit_task_assignment(
     task_id: str,
-    student_id: str = Form(...),
-    student_name: str = Form(...),
-    student_image: Optional[str] = Form(None),
     task_title: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    student: Principal = Depends(get_current_principal)
 ):
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid Task ID format")
-    task = tasks_collection.find_one({"_id": ObjectId(task_id)})
-    if not task:
+    if not await task_catalogue.get_task(task_id):
         raise HTTPException(status_code=404, detail=f"Task with id {task_id} not found")
 
-    # Validate student details
-    student = users_collection.find_one({"email": student_id})
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-
-    student_name = student["name"]
-    student_image = student.get("profileImage")
+    # The submitting student is the verified caller; student_id, student_name
+    # and student_image form fields sent by older clients are ignored.
+    student_id = student.email
+    student_name = student.name
+    student_image = student.profileImage
 
+    stored_blob = None
     try:
-        file_content = await file.read()
-        file_size = len(file_content)
-
-        # Check if file size exceeds a reasonable limit (e.g., 15MB to be safe with 16MB BSON limit)
-        MAX_FILE_SIZE_MB = 15
-        if file_size > MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=413, 
-                detail=f"File size exceeds the limit of {MAX_FILE_SIZE_MB}MB."
-            )
+        # Bodies are stored once per SHA-256; an identical upload just takes
+        # another reference on the existing blob.
+        stored_blob = await store_upload(file)
 
         submission_data_model = SubmissionCreate(
             taskId=task_id,
@@ -204,91 +271,205 @@ async def submit_task_assignment(
             studentImage=student_image,
             submissionDate=datetime.utcnow(),
             fileName=file.filename,
-            fileSize=file_size,
-            fileData=file_content, # Store file content
+            fileSize=stored_blob.size,
+            fileId=stored_blob.file_id,
+            fileStore=stored_blob.store,
+            fileHash=stored_blob.hash,
+            fileEncoding=stored_blob.encoding,
+            storedSize=stored_blob.stored_size,
             status="pending"
         )
         
-        # Use .model_dump() to get dict for MongoDB, ensure bytes are handled correctly
         submission_dict = submission_data_model.model_dump()
         
-        result = submissions_collection.insert_one(submission_dict)
-        created_submission_doc = submissions_collection.find_one({"_id": result.inserted_id})
-        
-        if created_submission_doc:
-            return submission_helper(created_submission_doc)
-        raise HTTPException(status_code=500, detail="Failed to create submission record")
+        submission_dict["_id"] = await submissions_repo.insert_one(submission_dict)
     except HTTPException as http_exc: # Re-raise HTTPExceptions
         raise http_exc
     except Exception as e:
-        # Log the exception for debugging
-        print(f"Error during submission: {str(e)}")
+        # Only reached before the insert succeeded, so nothing references the blob
+        if stored_blob:
+            await release_blob(stored_blob.hash)
+        logger.exception("submission failed", extra={"fields": {"task_id": task_id}})
         raise HTTPException(status_code=500, detail=f"An error occurred during file submission: {str(e)}")
     finally:
         await file.close()
 
+    await after_commit("task stats update", record_submission_change(None, submission_dict), submission_dict["_id"])
+    submission_changed("submission.created", submission_dict)
+    return submission_helper(submission_dict)
+
 @app.get("/submissions", response_model=List[SubmissionResponse])
-async def get_all_submissions(request: Request, taskId: str = Query(None), studentId: str = Query(None)):
-    print(f"Request received at /submissions (GET) from {request.client.host}")
+async def get_all_submissions(
+    request: Request,
+    taskId: str = Query(None),
+    studentId: str = Query(None),
+    status: Optional[str] = Query(None),
+    submittedFrom: Optional[datetime] = Query(None),
+    submittedTo: Optional[datetime] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_SUBMISSIONS_PAGE_SIZE),
+    after: Optional[str] = Query(None),
+):
     query = {}
     if taskId:
         query["taskId"] = taskId
     if studentId:
         query["studentId"] = studentId
-    submissions = []
-    for sub_doc in submissions_collection.find(query).sort("submissionDate", -1):
-        submissions.append(submission_helper(sub_doc))
-    return submissions
+    if status:
+        query["status"] = status
+    if submittedFrom or submittedTo:
+        query["submissionDate"] = {}
+        if submittedFrom:
+            query["submissionDate"]["$gte"] = submittedFrom
+        if submittedTo:
+            query["submissionDate"]["$lt"] = submittedTo
+    if after:
+        # Keyset pagination: continue strictly after the last (submissionDate, _id) seen
+        after_date, after_id = decode_submission_cursor(after)
+        query = {"$and": [query, {"$or": [
+            {"submissionDate": {"$lt": after_date}},
+            {"submissionDate": after_date, "_id": {"$lt": after_id}},
+        ]}]}
+
+    # Documents come back already in response shape and are encoded with
+    # orjson directly, bypassing submission_helper and response_model validation.
+    cursor = submissions_repo.find(
+        query,
+        SUBMISSION_RESPONSE_PROJECTION,
+        sort=[("submissionDate", -1), ("_id", -1)],
+        limit=limit or 0
+    )
+    if not limit:
+        return StreamingResponse(stream_json_array(cursor), media_type="application/json")
+    submissions = [sub_doc async for sub_doc in cursor]
+    headers = {}
+    if len(submissions) == limit:
+        headers["X-Next-Cursor"] = encode_submission_cursor(submissions[-1])
+    return json_response(submissions, headers)
+
+@app.get("/tasks/{task_id}/submissions/archive")
+async def download_task_submissions_archive(task_id: str, request: Request, status: Optional[str] = Query(None)):
+    if not ObjectId.is_valid(task_id):
+        raise HTTPException(status_code=400, detail="Invalid Task ID format")
+    task = await tasks_repo.find_one({"_id": ObjectId(task_id)}, {"title": 1})
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task with id {task_id} not found")
+
+    query = {"taskId": task_id}
+    if status:
+        query["status"] = status
+    submissions = submissions_repo.find(
+        query,
+        {"studentId": 1, "fileName": 1, "fileSize": 1, "fileId": 1, "fileStore": 1, "fileEncoding": 1, "submissionDate": 1},
+        sort=[("studentId", 1), ("submissionDate", -1), ("_id", -1)]
+    )
+    archive_name = "".join(c if c.isalnum() or c in "-_ " else "_" for c in task["title"]).strip() or task_id
+    return StreamingResponse(
+        stream_submissions_zip(submissions),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=\"{archive_name}-submissions.zip\""}
+    )
 
 @app.get("/submissions/file/{submission_id}")
 async def download_submission_file(submission_id: str, request: Request):
-    print(f"Request received at /submissions/file/{submission_id} (GET) from {request.client.host}")
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid Submission ID format")
     
-    submission = submissions_collection.find_one({"_id": ObjectId(submission_id)})
+    # Leave the legacy inline fileData out unless this submission actually needs it
+    submission = await submissions_repo.find_one({"_id": ObjectId(submission_id)}, {"fileData": 0})
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
     
-    file_data = submission.get("fileData")
+    file_id = submission.get("fileId")
     file_name = submission.get("fileName")
+    file_data = None
+    if not file_id:
+        # Submissions stored before the file store keep their bytes inline
+        legacy = await submissions_repo.find_one({"_id": ObjectId(submission_id)}, {"fileData": 1})
+        file_data = legacy.get("fileData") if legacy else None
 
-    if not file_data or not file_name:
+    if not (file_id or file_data) or not file_name:
         raise HTTPException(status_code=404, detail="File data or name not found in submission record")
-        
-    return Response(
-        content=file_data, 
-        media_type='application/octet-stream', 
-        headers={"Content-Disposition": f"attachment; filename=\"{file_name}\""}
+
+    # Stored files are never modified in place (a replacement gets a new fileId),
+    # so the file id and size identify the body exactly.
+    file_size = len(file_data) if file_data else submission["fileSize"]
+    etag = f'"{file_id or submission_id}-{file_size}"'
+    last_modified = submission.get("submissionDate")
+    headers = {
+        "Content-Disposition": f"attachment; filename=\"{file_name}\"",
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+    }
+    # Compressed bodies go out untouched to clients that accept the encoding,
+    # unless a range is asked for; ranges always address the decoded bytes.
+    encoding = None if file_data else submission.get("fileEncoding")
+    send_encoded = bool(encoding) and "range" not in request.headers and accepts_encoding(request, encoding)
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+    if send_encoded:
+        etag = f'"{file_id}-{file_size}-{encoding}"'
+        headers["ETag"] = etag
+        headers["Content-Encoding"] = encoding
+    if isinstance(last_modified, datetime):
+        headers["Last-Modified"] = http_date(last_modified)
+    else:
+        last_modified = None
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    file_store = get_file_store(submission.get("fileStore", "gridfs"))
+    if send_encoded:
+        headers["Content-Length"] = str(submission["storedSize"])
+        return StreamingResponse(
+            file_store.iter_chunks(file_id),
+            media_type='application/octet-stream',
+            headers=headers
+        )
+
+    byte_range = parse_range(request, file_size, etag)
+    start, end = byte_range if byte_range else (0, file_size)
+    headers["Content-Length"] = str(end - start)
+    status_code = 200
+    if byte_range:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{file_size}"
+
+    if file_data:
+        return Response(content=file_data[start:end], status_code=status_code, media_type='application/octet-stream', headers=headers)
+
+    return StreamingResponse(
+        iter_file_body(submission, start, end),
+        status_code=status_code,
+        media_type='application/octet-stream',
+        headers=headers
     )
 
 @app.put("/submissions/{submission_id}/replace", response_model=SubmissionResponse)
 async def replace_submission(
     submission_id: str,
     file: UploadFile = File(...),
-    student_id: str = Form(...),
-    student_name: str = Form(...),
-    student_image: Optional[str] = Form(None),
-    task_title: str = Form(...)
+    task_title: str = Form(...),
+    student: Principal = Depends(get_current_principal)
 ):
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid Submission ID format")
-    submission = submissions_collection.find_one({"_id": ObjectId(submission_id)})
-    if not submission:
-        raise HTTPException(status_code=404, detail="Submission not found")
+    # Students may only replace their own submissions
+    submission_filter = {"_id": ObjectId(submission_id), "studentId": student.email}
+    student_id = student.email
+    student_name = student.name
+    student_image = student.profileImage
     try:
-        file_content = await file.read()
-        file_size = len(file_content)
-        MAX_FILE_SIZE_MB = 15
-        if file_size > MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=413, 
-                detail=f"File size exceeds the limit of {MAX_FILE_SIZE_MB}MB."
-            )
+        stored_blob = await store_upload(file)
         update_data = {
             "fileName": file.filename,
-            "fileSize": file_size,
-            "fileData": file_content,
+            "fileSize": stored_blob.size,
+            "fileId": stored_blob.file_id,
+            "fileStore": stored_blob.store,
+            "fileHash": stored_blob.hash,
+            "fileEncoding": stored_blob.encoding,
+            "storedSize": stored_blob.stored_size,
             "submissionDate": datetime.utcnow(),
             "studentId": student_id,
             "studentName": student_name,
@@ -298,12 +479,30 @@ async def replace_submission(
             "grade": None,
             "feedback": None,
         }
-        submissions_collection.update_one(
-            {"_id": ObjectId(submission_id)},
-            {"$set": update_data}
-        )
-        updated = submissions_collection.find_one({"_id": ObjectId(submission_id)})
-        return submission_helper(updated)
+        # A single find_one_and_update swaps the file: the pre-update document
+        # tells us which file to release, and the response is built from it
+        # plus the update.
+        try:
+            previous = await submissions_repo.find_one_and_update(
+                submission_filter,
+                {"$set": update_data, "$unset": {"fileData": ""}},
+                projection={**TASK_STATS_FIELDS, "fileId": 1, "fileStore": 1, "fileHash": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+        except BaseException:
+            # Nothing points at the new reference yet
+            await release_blob(stored_blob.hash)
+            raise
+        if not previous:
+            await release_blob(stored_blob.hash)
+            raise HTTPException(status_code=404, detail="Submission not found")
+        # Re-uploading the same file acquired the same blob, so this only
+        # drops the extra reference.
+        await after_commit("releasing the replaced file", release_submission_file(previous), previous["_id"])
+        replaced = {**update_data, "_id": previous["_id"], "taskId": previous["taskId"]}
+        await after_commit("task stats update", record_submission_change(previous, replaced), previous["_id"])
+        submission_changed("submission.replaced", replaced)
+        return submission_helper(replaced)
     finally:
         await file.close()
 
@@ -311,14 +510,19 @@ async def replace_submission(
 async def delete_submission(submission_id: str):
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid Submission ID format")
-    result = submissions_collection.delete_one({"_id": ObjectId(submission_id)})
-    if result.deleted_count == 1:
+    deleted = await submissions_repo.find_one_and_delete(
+        {"_id": ObjectId(submission_id)},
+        projection={**TASK_STATS_FIELDS, "studentId": 1, "fileId": 1, "fileStore": 1, "fileHash": 1}
+    )
+    if deleted:
+        await after_commit("releasing the deleted file", release_submission_file(deleted), deleted["_id"])
+        await after_commit("task stats update", record_submission_change(deleted, None), deleted["_id"])
+        submission_changed("submission.deleted", deleted)
         return {"message": "Submission deleted"}
     raise HTTPException(status_code=404, detail="Submission not found")
 
 @app.put("/submissions/{submission_id}/grade", response_model=SubmissionResponse)
 async def grade_submission(submission_id: str, submission_update: SubmissionUpdate, request: Request):
-    print(f"Request received at /submissions/{submission_id}/grade (PUT) from {request.client.host}")
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid Submission ID format")
 
@@ -329,37 +533,201 @@ async def grade_submission(submission_id: str, submission_update: SubmissionUpda
     if "grade" in update_data or "feedback" in update_data:
         update_data["status"] = "graded"
 
-    result = submissions_collection.update_one(
+    # The pre-update document feeds the task rollups; the response is the
+    # same document with the update applied.
+    previous = await submissions_repo.find_one_and_update(
         {"_id": ObjectId(submission_id)},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection=SUBMISSION_LIST_PROJECTION,
+        return_document=ReturnDocument.BEFORE
     )
-
-    if result.matched_count == 0:
+    if not previous:
         raise HTTPException(status_code=404, detail=f"Submission with id {submission_id} not found")
-    
-    updated_submission_doc = submissions_collection.find_one({"_id": ObjectId(submission_id)})
-    
-    # --- REMOVE GLOBAL isCompleted UPDATE ---
-    # Do NOT set isCompleted globally for the task here.
-    # Task completion is now per-student, tracked via submissions only.
+    updated_submission_doc = {**previous, **update_data}
+    await after_commit("task stats update", record_submission_change(previous, updated_submission_doc), submission_id)
+
+    # Task completion and unlocking are per-student: the shared task document
+    # is never modified here, only the student's progress record.
 
     # Unlock next task if grade is A or B
-    if updated_submission_doc and updated_submission_doc.get("grade") in ["A", "B"]:
-        # Find the next locked task for the student and unlock it
-        student_id = updated_submission_doc["studentId"]
-        all_tasks = list(tasks_collection.find().sort("dueDate", 1))
-        completed_task_ids = [
-            s["taskId"] for s in submissions_collection.find({"studentId": student_id, "status": "graded", "grade": {"$in": ["A", "B"]}})
-        ]
-        # Find the next locked task not in completed_task_ids
-        for task in all_tasks:
-            if str(task["_id"]) not in completed_task_ids and task.get("isLocked", False):
-                tasks_collection.update_one({"_id": task["_id"]}, {"$set": {"isLocked": False}})
-                break
-                
-    if updated_submission_doc:
-        return submission_helper(updated_submission_doc)
-    raise HTTPException(status_code=500, detail="Failed to retrieve updated submission")
+    if updated_submission_doc.get("grade") in PASSING_GRADES:
+        await after_commit(
+            "progress update",
+            record_completion(updated_submission_doc["studentId"], updated_submission_doc["taskId"]),
+            submission_id
+        )
+
+    submission_changed("submission.graded", updated_submission_doc)
+    return submission_helper(updated_submission_doc)
+
+@app.put("/submissions/grades", response_model=BulkGradeResponse)
+async def grade_submissions_bulk(bulk: BulkGradeRequest, request: Request):
+    errors = {}
+    items = {}
+    for item in bulk.grades:
+        if not ObjectId.is_valid(item.submission_id):
+            errors[item.submission_id] = "Invalid Submission ID format"
+        elif item.submission_id in items:
+            errors[item.submission_id] = "Submission listed more than once"
+        else:
+            items[item.submission_id] = item
+    for submission_id in errors:
+        items.pop(submission_id, None)
+
+    # Each update appends the status and grade it replaced to the document's
+    # pendingGradings, tagged with this request's token, and the entry is
+    # pulled again once read. Overlapping bulk gradings each find their own
+    # entry, so every rollup delta starts from the state its update overwrote.
+    grading_op = ObjectId()
+    operations = []
+    submission_ids = []
+    for submission_id, item in items.items():
+        update_data = item.model_dump(exclude_unset=True, exclude={"submission_id"})
+        if not update_data:
+            errors[submission_id] = "No update data provided"
+            continue
+        update_data["status"] = "graded"
+        operations.append(UpdateOne({"_id": ObjectId(submission_id)}, [{"$set": {
+            **{field: {"$literal": value} for field, value in update_data.items()},
+            "pendingGradings": {"$slice": [
+                {"$concatArrays": [
+                    {"$ifNull": ["$pendingGradings", []]},
+                    [{"op": grading_op, "status": "$status", "grade": "$grade"}],
+                ]},
+                -MAX_PENDING_GRADINGS,
+            ]},
+        }}]))
+        submission_ids.append(submission_id)
+
+    if operations:
+        try:
+            await submissions_repo.bulk_write(operations)
+        except BulkWriteError as bwe:
+            for write_error in bwe.details.get("writeErrors", []):
+                errors[submission_ids[write_error["index"]]] = write_error.get("errmsg", "Write failed")
+
+    # One read for the graded submissions' owners and replaced state, then
+    # one write dropping this request's entries
+    written_ids = [ObjectId(submission_id) for submission_id in submission_ids if submission_id not in errors]
+    graded = {
+        str(doc["_id"]): doc
+        async for doc in submissions_repo.find(
+            {"_id": {"$in": written_ids}},
+            {**TASK_STATS_FIELDS, "studentId": 1, "pendingGradings": 1}
+        )
+    } if written_ids else {}
+    if graded:
+        try:
+            await submissions_repo.update_many(
+                {"_id": {"$in": written_ids}}, {"$pull": {"pendingGradings": {"op": grading_op}}}
+            )
+        except Exception:
+            # Left-over entries are harmless: the list is capped
+            logger.exception("clearing pending gradings failed after bulk grading")
+
+    # Publish the grade events, fold the rollup deltas into one write and
+    # recompute unlock state for every affected student in one batch. The
+    # grades are committed by now, so follow-up failures are reported per
+    # item rather than failing the request.
+    completions = {}
+    stats_changes = []
+    owners = {}
+    untracked = set()
+    for submission_id in submission_ids:
+        if submission_id in errors:
+            continue
+        doc = graded.get(submission_id)
+        if not doc:
+            errors[submission_id] = "Submission not found"
+            continue
+        update_data = items[submission_id].model_dump(exclude_unset=True, exclude={"submission_id"})
+        pending = doc.pop("pendingGradings", [])
+        graded_doc = {**doc, **update_data, "status": "graded"}
+        owners[submission_id] = doc["studentId"]
+        replaced = next((entry for entry in pending if entry.get("op") == grading_op), None)
+        if replaced is not None:
+            previous = {**graded_doc, "status": replaced.get("status"), "grade": replaced.get("grade")}
+            stats_changes.append((previous, graded_doc))
+        else:
+            # More than MAX_PENDING_GRADINGS overlapping gradings pushed the
+            # entry out; only rebuild_task_stats() can square the rollups now
+            untracked.add(submission_id)
+        submission_changed("submission.graded", graded_doc)
+        if graded_doc.get("grade") in PASSING_GRADES:
+            completions.setdefault(doc["studentId"], []).append(doc["taskId"])
+
+    warnings = {submission_id: "Task statistics could not be updated" for submission_id in untracked}
+    try:
+        await record_submission_changes(stats_changes)
+    except Exception:
+        logger.exception("task stats update failed after bulk grading")
+        warnings = {submission_id: "Task statistics could not be updated" for submission_id in owners}
+    try:
+        progress_errors = await record_completions_many(completions)
+    except Exception as exc:
+        logger.exception("progress update failed after bulk grading")
+        progress_errors = {student_id: str(exc) for student_id in completions}
+    for submission_id, student_id in owners.items():
+        if student_id in progress_errors:
+            warnings[submission_id] = f"Task unlocks could not be updated: {progress_errors[student_id]}"
+
+    results = [
+        {
+            "submission_id": item.submission_id,
+            "success": item.submission_id not in errors,
+            "error": errors.get(item.submission_id),
+            "warning": warnings.get(item.submission_id),
+        }
+        for item in bulk.grades
+    ]
+    graded = sum(1 for result in results if result["success"])
+    return {"graded": graded, "failed": len(results) - graded, "results": results}
+
+@app.get("/students/{student_id}/progress", response_model=StudentProgressResponse)
+async def get_student_progress(student_id: str):
+    progress = await get_progress(student_id)
+    return {
+        "studentId": progress["_id"],
+        "completedTaskIds": progress.get("completedTaskIds", []),
+        "unlockedTaskIds": progress.get("unlockedTaskIds", []),
+    }
+
+@app.get("/students/{student_id}/dashboard", response_model=StudentDashboardResponse)
+async def get_student_dashboard_view(student_id: str, request: Request):
+    return json_response(await get_student_dashboard(student_id))
+
+@app.get("/events")
+async def subscribe_to_events(
+    request: Request,
+    studentId: Optional[str] = Query(None),
+    taskId: Optional[str] = Query(None),
+    principal: Principal = Depends(get_stream_principal)
+):
+    # Server-Sent Events: a student's feed carries their own submissions,
+    # grades and unlocks; a task's feed carries its submissions. Without
+    # either, every submission change is sent (teacher overview). Students
+    # only ever get their own feed; other students', task and overview feeds
+    # are for teachers. Catalogue changes are always included.
+    if lifecycle.draining:
+        # Reconnect elsewhere rather than to a worker about to exit
+        raise HTTPException(status_code=503, detail="Server is shutting down", headers={"Retry-After": "1"})
+    if principal.role != "teacher":
+        if taskId or (studentId and studentId != principal.email):
+            raise HTTPException(status_code=403, detail="Students can only follow their own events")
+        studentId = principal.email
+    topics = []
+    if studentId:
+        topics.append(student_topic(studentId))
+    if taskId:
+        topics.append(task_topic(taskId))
+    if not topics:
+        topics.append(SUBMISSIONS_TOPIC)
+    subscription = event_hub.subscribe(topics)
+    return StreamingResponse(
+        stream_events(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/users")
 async def get_users(role: Optional[str] = None):
@@ -367,7 +735,7 @@ async def get_users(role: Optional[str] = None):
     if role:
         query["role"] = role
     users = []
-    for user in users_collection.find(query):
+    async for user in users_repo.find(query, {"password": 0}):
         users.append({
             "id": str(user["_id"]),
             "name": user["name"],
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator
 from bson import ObjectId
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 class UserSignup(BaseModel):
@@ -63,7 +63,11 @@ class SubmissionBase(BaseModel):
     submissionDate: datetime = Field(default_factory=datetime.utcnow)
     fileName: str
     fileSize: int # Store file size in bytes
-    fileData: Optional[bytes] = None # Store file content directly
+    fileId: Optional[str] = None # Reference to the file body in the file store
+    fileStore: Optional[str] = None # Which file store backend holds the body
+    fileHash: Optional[str] = None # SHA-256 of the body, key of its shared blob
+    fileEncoding: Optional[str] = None # "zstd" or "deflate" if the stored body is compressed
+    storedSize: Optional[int] = None # Bytes held by the file store; fileSize is the original size
     status: str = "pending"  # "pending", "graded"
     grade: Optional[str] = None
     feedback: Optional[str] = None
@@ -76,7 +80,7 @@ class SubmissionUpdate(BaseModel):
     grade: Optional[str] = None
     feedback: Optional[str] = None
 
-class SubmissionResponse(BaseModel): # Modified to not include fileData or filePath
+class SubmissionResponse(BaseModel): # Modified to not include the file body or its reference
     id: str
     taskId: str
     taskTitle: str
@@ -90,6 +94,51 @@ class SubmissionResponse(BaseModel): # Modified to not include fileData or fileP
     grade: Optional[str] = None
     feedback: Optional[str] = None
 
+class BulkGradeItem(BaseModel):
+    submission_id: str
+    grade: Optional[str] = None
+    feedback: Optional[str] = None
+
+class BulkGradeRequest(BaseModel):
+    grades: List[BulkGradeItem] = Field(..., min_length=1, max_length=5000)
+
+class BulkGradeResult(BaseModel):
+    submission_id: str
+    success: bool
+    error: Optional[str] = None
+    # Set when the grade was saved but a follow-up update (unlocks, task stats) failed
+    warning: Optional[str] = None
+
+class BulkGradeResponse(BaseModel):
+    graded: int
+    failed: int
+    results: List[BulkGradeResult]
+
+class StudentProgressResponse(BaseModel):
+    studentId: str
+    completedTaskIds: List[str] = []
+    unlockedTaskIds: List[str] = [] # Catalogue-locked tasks unlocked for this student
+
+class DashboardTaskResponse(TaskResponse):
+    # isLocked/isCompleted reflect this student's progress, not the catalogue defaults
+    latestSubmission: Optional[SubmissionResponse] = None
+
+class StudentDashboardResponse(BaseModel):
+    studentId: str
+    tasks: List[DashboardTaskResponse]
+
+class TaskStatsResponse(BaseModel):
+    taskId: str
+    taskTitle: str
+    dueDate: str
+    submissions: int
+    pending: int
+    graded: int
+    grades: Dict[str, int]
+    onTime: int
+    late: int
+    totalBytes: int
+
 class SubmissionInDB(SubmissionBase):
     id: str = Field(alias="_id")
 
@@ -0,0 +1,185 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from pymongo import monitoring
+
+from repository import count_round_trips, record_round_trip
+
+# Fraction of successful requests that get an access log line; errors and
+# slow requests are always logged.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+logger = logging.getLogger("eduquest")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", ["method"], multiprocess_mode="livesum"
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ["command"]
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed", ["command"]
+)
+DB_ROUND_TRIPS = Histogram(
+    "http_request_db_round_trips", "MongoDB commands issued per HTTP request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 20, 50, 100)
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify latency in the worker pool", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+
+UPLOAD_BUDGET_BYTES_IN_USE = Gauge(
+    "upload_budget_bytes_in_use", "Upload body bytes admitted and not yet released", multiprocess_mode="livesum"
+)
+UPLOAD_BUDGET_UTILIZATION = Gauge(
+    "upload_budget_utilization", "Fraction of the per-process upload byte budget in use", multiprocess_mode="livemax"
+)
+UPLOADS_IN_PROGRESS = Gauge(
+    "uploads_in_progress", "Upload requests currently admitted", multiprocess_mode="livesum"
+)
+UPLOADS_REJECTED = Counter(
+    "uploads_rejected_total", "Upload requests rejected by admission control", ["reason"]
+)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        line.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+# Handlers only enqueue records; a listener thread does the blocking stdout
+# writes, so logging never stalls the event loop.
+_log_queue = queue.SimpleQueue()
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(JsonFormatter())
+_queue_listener = logging.handlers.QueueListener(_log_queue, _stream_handler)
+_listener_running = False
+
+
+def configure_logging() -> None:
+    global _listener_running
+    if _listener_running:
+        return
+    logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    _queue_listener.start()
+    _listener_running = True
+
+
+def shutdown_logging() -> None:
+    # Flushes queued records before the process exits
+    global _listener_running
+    if _listener_running:
+        _queue_listener.stop()
+        _listener_running = False
+
+
+def release_worker_metrics() -> None:
+    # Drops this worker's live gauges from the multiprocess aggregate on exit
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        record_round_trip(event.command_name)
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(event.command_name).inc()
+
+
+class RequestMetricsMiddleware:
+    # Pure ASGI rather than @app.middleware("http"): the request is finished
+    # when its last body chunk has been sent, not when the headers have, so
+    # streamed downloads, archives and event streams are timed in full and
+    # stay in progress while they stream.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+        started = time.perf_counter()
+        status = 500
+        finished = False
+
+        with count_round_trips() as round_trips:
+            def finish():
+                nonlocal finished
+                if finished:
+                    return
+                finished = True
+                duration = time.perf_counter() - started
+                HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+                # Label by route template, not raw path, to keep cardinality bounded
+                route = scope.get("route")
+                route_path = getattr(route, "path", "unmatched")
+                HTTP_REQUEST_DURATION.labels(method, route_path, str(status)).observe(duration)
+                DB_ROUND_TRIPS.labels(method, route_path).observe(round_trips.count)
+                if status >= 500 or duration >= SLOW_REQUEST_SECONDS or random.random() < LOG_SAMPLE_RATE:
+                    client = scope.get("client")
+                    logger.info("request", extra={"fields": {
+                        "method": method,
+                        "route": route_path,
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 2),
+                        "db_round_trips": round_trips.count,
+                        "client": client[0] if client else None,
+                    }})
+
+            async def send_and_observe(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                await send(message)
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    finish()
+
+            try:
+                await self.app(scope, receive, send_and_observe)
+            finally:
+                # Covers requests that fail before or while responding
+                finish()
+
+
+def metrics_response() -> Response:
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate samples written by every worker process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,142 @@
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from catalogue import task_catalogue
+from database import progress_repo
+from events import tasks_unlocked
+
+# Grades that count a task as completed and unlock the next one
+PASSING_GRADES = ("A", "B")
+_FRONTIER_RETRIES = 3
+_DUPLICATE_KEY = 11000
+
+# Per-student progression lives in the `progress` collection, one document per
+# student keyed by studentId:
+#   completedTaskIds - tasks passed with an A or B
+#   unlockedTaskIds  - catalogue-locked tasks this student has unlocked
+#   frontier         - {dueDate, taskId} of the last task unlocked; tasks are
+#                      unlocked in (dueDate, _id) order, so the next unlocks
+#                      are the catalogue's locked tasks past the frontier.
+
+
+class ProgressConflictError(Exception):
+    pass
+
+
+def empty_progress(student_id: str) -> dict:
+    return {"_id": student_id, "completedTaskIds": [], "unlockedTaskIds": [], "frontier": None}
+
+
+async def get_progress(student_id: str) -> dict:
+    progress = await progress_repo.find_one({"_id": student_id})
+    return progress or empty_progress(student_id)
+
+
+def _next_unlocks(locked_tasks: List[dict], frontier: Optional[dict], count: int) -> List[dict]:
+    # locked_tasks is the catalogue's locked tasks in (dueDate, id) order;
+    # ObjectId order matches the order of their hex strings.
+    if frontier:
+        after = (frontier["dueDate"], str(frontier["taskId"]))
+        locked_tasks = [task for task in locked_tasks if (task["dueDate"], task["id"]) > after]
+    return locked_tasks[:count]
+
+
+def _completion_write(progress: dict, task_ids: List[str], locked_tasks: List[dict]) -> Optional[Tuple[dict, dict, List[str]]]:
+    # Builds the conditional progress update that marks task_ids completed
+    # and unlocks one task per newly completed one: (filter, update, unlocked
+    # task ids), or None if every task was already completed.
+    completed = set(progress.get("completedTaskIds", []))
+    new_task_ids = [task_id for task_id in dict.fromkeys(task_ids) if task_id not in completed]
+    if not new_task_ids:
+        return None
+    frontier = progress.get("frontier")
+    next_tasks = _next_unlocks(locked_tasks, frontier, len(new_task_ids))
+    unlocked = [task["id"] for task in next_tasks]
+    update = {"$addToSet": {
+        "completedTaskIds": {"$each": new_task_ids},
+        "unlockedTaskIds": {"$each": unlocked},
+    }}
+    if next_tasks:
+        last = next_tasks[-1]
+        update["$set"] = {"frontier": {"dueDate": last["dueDate"], "taskId": ObjectId(last["id"])}}
+    # The frontier and completion conditions make concurrent grades for the
+    # same student conflict instead of unlocking the same task twice.
+    return {"_id": progress["_id"], "frontier": frontier, "completedTaskIds": {"$nin": new_task_ids}}, update, unlocked
+
+
+async def record_completions(student_id: str, task_ids: List[str]) -> List[str]:
+    # Marks tasks completed and unlocks one catalogue-locked task per newly
+    # completed one: a progress read and one conditional upsert however many
+    # tasks are passed. Returns the ids of the tasks unlocked; raises
+    # ProgressConflictError if concurrent updates win every retry.
+    for _ in range(_FRONTIER_RETRIES):
+        progress = await get_progress(student_id)
+        write = _completion_write(progress, task_ids, (await task_catalogue.get()).locked_tasks)
+        if write is None:
+            return []
+        filter, update, unlocked = write
+        try:
+            result = await progress_repo.update_one(filter, update, upsert=True)
+        except DuplicateKeyError:
+            continue
+        if result.modified_count or result.upserted_id is not None:
+            tasks_unlocked(student_id, unlocked)
+            return unlocked
+    raise ProgressConflictError(
+        f"Progress of {student_id} kept changing; completion not recorded after {_FRONTIER_RETRIES} attempts"
+    )
+
+
+async def record_completion(student_id: str, task_id: str) -> Optional[str]:
+    unlocked = await record_completions(student_id, [task_id])
+    return unlocked[0] if unlocked else None
+
+
+async def record_completions_many(completions: Dict[str, List[str]]) -> Dict[str, str]:
+    # record_completions for many students at once: one read of all their
+    # progress documents and one bulk write, whatever the number of students.
+    # Students whose progress changed in between are retried one at a time.
+    # Returns {student_id: error} for the students that could not be updated.
+    if not completions:
+        return {}
+    locked_tasks = (await task_catalogue.get()).locked_tasks
+    progress_docs = {
+        doc["_id"]: doc async for doc in progress_repo.find({"_id": {"$in": list(completions)}})
+    }
+    student_ids, operations, unlocks = [], [], []
+    for student_id, task_ids in completions.items():
+        write = _completion_write(progress_docs.get(student_id) or empty_progress(student_id), task_ids, locked_tasks)
+        if write:
+            filter, update, unlocked = write
+            student_ids.append(student_id)
+            operations.append(UpdateOne(filter, update, upsert=True))
+            unlocks.append(unlocked)
+
+    write_errors = {}
+    if operations:
+        try:
+            await progress_repo.bulk_write(operations)
+        except BulkWriteError as bwe:
+            write_errors = {error["index"]: error for error in bwe.details.get("writeErrors", [])}
+
+    errors = {}
+    conflicts = []
+    for index, student_id in enumerate(student_ids):
+        error = write_errors.get(index)
+        if error is None:
+            # Every condition held, so the update applied
+            tasks_unlocked(student_id, unlocks[index])
+        elif error.get("code") == _DUPLICATE_KEY:
+            # The filter no longer matched and the upsert collided
+            conflicts.append(student_id)
+        else:
+            errors[student_id] = error.get("errmsg", "Progress update failed")
+    for student_id in conflicts:
+        try:
+            await record_completions(student_id, completions[student_id])
+        except (PyMongoError, ProgressConflictError) as exc:
+            errors[student_id] = str(exc)
+    return errors
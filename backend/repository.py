@@ -0,0 +1,206 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+
+# Dev/test guard: explain() every filtered or sorted query - reads, the filter
+# of every write, and aggregations that open with a $match or $sort - and fail
+# if a winning plan scans the whole collection. Unfiltered, unsorted queries
+# are deliberate full reads and are not checked.
+QUERY_PLAN_GUARD = os.getenv("QUERY_PLAN_GUARD", "").lower() in ("1", "true", "yes")
+
+
+class CollectionScanError(Exception):
+    pass
+
+
+# Round-trip accounting: every command the driver sends (including getMore
+# and GridFS chunk writes) is recorded against every active counter, so a
+# test can count the trips of a request the metrics middleware also counts.
+class RoundTripCounter:
+    def __init__(self, parent: Optional["RoundTripCounter"] = None):
+        self.commands: List[str] = []
+        self.parent = parent
+
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+
+
+_round_trip_counter: ContextVar[Optional[RoundTripCounter]] = ContextVar("round_trip_counter", default=None)
+
+
+@contextmanager
+def count_round_trips() -> Iterator[RoundTripCounter]:
+    counter = RoundTripCounter(_round_trip_counter.get())
+    token = _round_trip_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _round_trip_counter.reset(token)
+
+
+def record_round_trip(command_name: str) -> None:
+    counter = _round_trip_counter.get()
+    while counter is not None:
+        counter.commands.append(command_name)
+        counter = counter.parent
+
+
+def _winning_plans(explanation) -> Iterator[dict]:
+    # find() explains carry one queryPlanner; aggregate explains nest one per
+    # $cursor stage (or per shard). Rejected plans are never looked at.
+    if isinstance(explanation, dict):
+        for key, value in explanation.items():
+            if key == "winningPlan":
+                yield value
+            elif key != "rejectedPlans":
+                yield from _winning_plans(value)
+    elif isinstance(explanation, list):
+        for value in explanation:
+            yield from _winning_plans(value)
+
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+
+# Thin async wrapper around a collection. Handlers go through these methods
+# rather than the driver so every query runs on the event loop without
+# blocking it, and so there is a single place to instrument database access.
+class Repository:
+    # Bound to a collection name rather than a collection object, so the
+    # repositories can be created at import time while the client itself is
+    # created later, in the process that serves requests.
+    def __init__(self, name: str, get_database: Callable[[], AsyncDatabase]):
+        self.name = name
+        self._get_database = get_database
+        self._database: Optional[AsyncDatabase] = None
+        self._collection: Optional[AsyncCollection] = None
+
+    @property
+    def collection(self) -> AsyncCollection:
+        database = self._get_database()
+        if database is not self._database:
+            self._database = database
+            self._collection = database[self.name]
+        return self._collection
+
+    async def _check_plan(self, filter: Optional[dict], sort: Optional[list] = None) -> None:
+        # Writes select their documents the same way a find() with the same
+        # filter would, so that is what gets explained for them.
+        if not QUERY_PLAN_GUARD or (not filter and not sort):
+            return
+        explanation = await self.collection.find(filter or {}, sort=sort).explain()
+        if any(_has_collscan(plan) for plan in _winning_plans(explanation)):
+            raise CollectionScanError(
+                f"Query on '{self.name}' uses a collection scan: filter={filter!r} sort={sort!r}"
+            )
+
+    async def _check_pipeline_plan(self, pipeline: list) -> None:
+        if not QUERY_PLAN_GUARD or not pipeline or not ({"$match", "$sort"} & set(pipeline[0])):
+            return
+        explanation = await self.collection.database.command(
+            "aggregate", self.name, pipeline=pipeline, explain=True
+        )
+        if any(_has_collscan(plan) for plan in _winning_plans(explanation)):
+            raise CollectionScanError(
+                f"Aggregation on '{self.name}' uses a collection scan: first stage={pipeline[0]!r}"
+            )
+
+    async def _check_bulk_plans(self, requests: list) -> None:
+        if not QUERY_PLAN_GUARD:
+            return
+        # Bulk operations usually share one filter shape; explain one of each.
+        # The driver keeps the filter on the private _filter attribute.
+        shapes = {}
+        for request in requests:
+            filter = getattr(request, "_filter", None)
+            if filter:
+                shapes.setdefault(tuple(sorted(filter)), filter)
+        for filter in shapes.values():
+            await self._check_plan(filter)
+
+    async def find_one(self, filter: dict, projection: Optional[dict] = None, sort: Optional[list] = None) -> Optional[dict]:
+        await self._check_plan(filter, sort)
+        return await self.collection.find_one(filter, projection, sort=sort)
+
+    async def find(
+        self,
+        filter: Optional[dict] = None,
+        projection: Optional[dict] = None,
+        sort: Optional[list] = None,
+        limit: int = 0,
+    ) -> AsyncIterator[dict]:
+        await self._check_plan(filter, sort)
+        cursor = self.collection.find(filter or {}, projection, sort=sort, limit=limit)
+        try:
+            async for doc in cursor:
+                yield doc
+        finally:
+            await cursor.close()
+
+    async def find_list(
+        self,
+        filter: Optional[dict] = None,
+        projection: Optional[dict] = None,
+        sort: Optional[list] = None,
+        limit: int = 0,
+    ) -> List[dict]:
+        return [doc async for doc in self.find(filter, projection, sort, limit)]
+
+    async def aggregate(self, pipeline: list) -> AsyncIterator[dict]:
+        await self._check_pipeline_plan(pipeline)
+        cursor = await self.collection.aggregate(pipeline)
+        try:
+            async for doc in cursor:
+                yield doc
+        finally:
+            await cursor.close()
+
+    async def insert_one(self, document: dict) -> Any:
+        result = await self.collection.insert_one(document)
+        return result.inserted_id
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False):
+        await self._check_plan(filter)
+        return await self.collection.update_one(filter, update, upsert=upsert)
+
+    async def update_many(self, filter: dict, update: dict):
+        await self._check_plan(filter)
+        return await self.collection.update_many(filter, update)
+
+    async def find_one_and_update(
+        self,
+        filter: dict,
+        update: dict,
+        projection: Optional[dict] = None,
+        upsert: bool = False,
+        return_document: ReturnDocument = ReturnDocument.AFTER,
+    ) -> Optional[dict]:
+        await self._check_plan(filter)
+        return await self.collection.find_one_and_update(
+            filter, update, projection=projection, upsert=upsert, return_document=return_document
+        )
+
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        await self._check_plan(filter)
+        return await self.collection.find_one_and_delete(filter, projection=projection)
+
+    async def bulk_write(self, requests: list, ordered: bool = False):
+        await self._check_bulk_plans(requests)
+        return await self.collection.bulk_write(requests, ordered=ordered)
+
+    async def delete_one(self, filter: dict):
+        await self._check_plan(filter)
+        return await self.collection.delete_one(filter)
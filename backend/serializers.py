@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi import Response
+
+# Helper function to convert MongoDB document to TaskResponse
+def task_helper(task) -> dict:
+    return {
+        "id": str(task["_id"]),
+        "title": task["title"],
+        "description": task["description"],
+        "videoUrl": task.get("videoUrl"),
+        "dueDate": task["dueDate"],
+        "estimatedTime": task.get("estimatedTime"),
+        "instructions": task.get("instructions"),
+        "isLocked": task.get("isLocked", False),
+        "isCompleted": task.get("isCompleted", False),
+    }
+
+
+def format_submission_date(value):
+    # MongoDB keeps milliseconds, so a date is cut to them before formatting:
+    # a freshly written datetime then renders exactly like the stored copy,
+    # and exactly like SUBMISSION_RESPONSE_PROJECTION renders it.
+    if not isinstance(value, datetime):
+        return value
+    return value.replace(microsecond=value.microsecond // 1000 * 1000).isoformat()
+
+
+# Helper function to convert MongoDB document to SubmissionResponse
+def submission_helper(submission) -> dict:
+    return {
+        "id": str(submission["_id"]),
+        "taskId": submission["taskId"],
+        "taskTitle": submission["taskTitle"],
+        "studentId": submission["studentId"],
+        "studentName": submission["studentName"],
+        "studentImage": submission.get("studentImage"),
+        "submissionDate": format_submission_date(submission["submissionDate"]),
+        "fileName": submission["fileName"],
+        "fileSize": submission["fileSize"],
+        "status": submission["status"],
+        "grade": submission.get("grade"),
+        "feedback": submission.get("feedback"),
+    }
+
+# Metadata-only projection for submission listings; never pull file bodies
+SUBMISSION_LIST_PROJECTION = {
+    "taskId": 1, "taskTitle": 1, "studentId": 1, "studentName": 1, "studentImage": 1,
+    "submissionDate": 1, "fileName": 1, "fileSize": 1, "status": 1, "grade": 1, "feedback": 1,
+}
+
+# Server-side equivalent of submission_helper: the database returns documents
+# already shaped like SubmissionResponse, so listings can be encoded straight
+# from the cursor without a per-field copy or response-model validation.
+SUBMISSION_RESPONSE_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "taskId": 1,
+    "taskTitle": 1,
+    "studentId": 1,
+    "studentName": 1,
+    "studentImage": {"$ifNull": ["$studentImage", None]},
+    # Matches datetime.isoformat(), which leaves out a zero fraction
+    "submissionDate": {"$cond": [
+        {"$ne": [{"$type": "$submissionDate"}, "date"]},
+        "$submissionDate",
+        {"$cond": [
+            {"$eq": [{"$millisecond": "$submissionDate"}, 0]},
+            {"$dateToString": {"date": "$submissionDate", "format": "%Y-%m-%dT%H:%M:%S"}},
+            {"$dateToString": {"date": "$submissionDate", "format": "%Y-%m-%dT%H:%M:%S.%L000"}},
+        ]},
+    ]},
+    "fileName": 1,
+    "fileSize": 1,
+    "status": 1,
+    "grade": {"$ifNull": ["$grade", None]},
+    "feedback": {"$ifNull": ["$feedback", None]},
+}
+
+
+def json_response(payload, headers: Optional[dict] = None) -> Response:
+    return Response(content=orjson.dumps(payload), media_type="application/json", headers=headers)
+
+
+# Streams a JSON array one document at a time for listings too large to buffer
+async def stream_json_array(docs: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    separator = b"["
+    async for doc in docs:
+        yield separator + orjson.dumps(doc)
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
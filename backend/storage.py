@@ -0,0 +1,174 @@
+import asyncio
+import os
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile
+from gridfs import AsyncGridFSBucket
+from gridfs.errors import NoFile
+
+from compression import decompress_chunks
+from database import get_db
+
+# Uploads are read and written in chunks of this size, so peak memory per
+# upload stays at roughly one chunk regardless of the file size.
+CHUNK_SIZE = 1024 * 1024
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "100"))
+MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024
+
+FILE_STORE = os.getenv("FILE_STORE", "gridfs")  # "gridfs" or "local"
+FILE_STORE_PATH = os.getenv("FILE_STORE_PATH", os.path.join(os.path.dirname(__file__), "uploads"))
+
+
+@dataclass
+class StoredFile:
+    id: str
+    size: int
+
+
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File size exceeds the limit of {MAX_FILE_SIZE_MB}MB."
+    )
+
+
+async def read_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    # Yields the upload chunk by chunk, enforcing the size limit as it goes
+    size = 0
+    while chunk := await upload.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_FILE_SIZE:
+            raise file_too_large()
+        yield chunk
+
+
+class GridFSFileStore:
+    name = "gridfs"
+
+    def __init__(self, get_database, bucket_name: str = "submission_files"):
+        self._get_database = get_database
+        self.bucket_name = bucket_name
+        self._database = None
+        self._bucket = None
+
+    @property
+    def bucket(self) -> AsyncGridFSBucket:
+        # Follows the current client, which is created per worker process
+        database = self._get_database()
+        if database is not self._database:
+            self._database = database
+            self._bucket = AsyncGridFSBucket(database, bucket_name=self.bucket_name, chunk_size_bytes=CHUNK_SIZE)
+        return self._bucket
+
+    async def save(
+        self, chunks: AsyncIterator[bytes], filename: str = "upload", content_type: Optional[str] = None
+    ) -> StoredFile:
+        grid_in = self.bucket.open_upload_stream(filename, metadata={"contentType": content_type})
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return StoredFile(id=str(grid_in._id), size=size)
+
+    async def iter_chunks(self, file_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream(ObjectId(file_id))
+        try:
+            await grid_out.seek(start)
+            remaining = (end if end is not None else grid_out.length) - start
+            while remaining > 0:
+                chunk = await grid_out.readchunk()
+                if not chunk:
+                    break
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await grid_out.close()
+
+    async def delete(self, file_id: str) -> None:
+        try:
+            await self.bucket.delete(ObjectId(file_id))
+        except NoFile:
+            pass
+
+
+class LocalFileStore:
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, file_id: str) -> str:
+        # Fan out into sub-directories so a single directory never holds every upload
+        return os.path.join(self.root, file_id[:2], file_id)
+
+    async def save(
+        self, chunks: AsyncIterator[bytes], filename: str = "upload", content_type: Optional[str] = None
+    ) -> StoredFile:
+        file_id = uuid.uuid4().hex
+        path = self._path(file_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".part"
+        size = 0
+        try:
+            with open(tmp_path, "wb") as out:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    # Disk writes run in a worker thread to keep the event loop free
+                    await asyncio.to_thread(out.write, chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return StoredFile(id=file_id, size=size)
+
+    async def iter_chunks(self, file_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        with open(self._path(file_id), "rb") as f:
+            f.seek(start)
+            remaining = (end if end is not None else os.fstat(f.fileno()).st_size) - start
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, file_id: str) -> None:
+        try:
+            os.remove(self._path(file_id))
+        except FileNotFoundError:
+            pass
+
+
+_stores = {}
+
+def get_file_store(name: str = FILE_STORE):
+    # Submissions record which backend holds their file, so downloads keep
+    # working if FILE_STORE is switched later on.
+    if name not in _stores:
+        if name == "gridfs":
+            _stores[name] = GridFSFileStore(get_db)
+        elif name == "local":
+            _stores[name] = LocalFileStore(FILE_STORE_PATH)
+        else:
+            raise ValueError(f"Unknown file store backend: {name}")
+    return _stores[name]
+
+
+def iter_file_body(submission: dict, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+    # Decoded bytes [start, end) of a submission's stored file
+    file_store = get_file_store(submission.get("fileStore", "gridfs"))
+    encoding = submission.get("fileEncoding")
+    if not encoding:
+        return file_store.iter_chunks(submission["fileId"], start, end)
+    return decompress_chunks(file_store.iter_chunks(submission["fileId"]), encoding, start, end, CHUNK_SIZE)
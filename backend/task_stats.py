@@ -0,0 +1,194 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import unquote
+
+from pymongo import UpdateOne
+
+from catalogue import task_catalogue
+from database import submissions_repo, task_stats_repo
+
+# Per-task rollups in the `task_stats` collection, one document per task
+# keyed by taskId:
+#   submissions, pending, graded - submission counts by status
+#   grades                       - {grade: count} over graded submissions, keyed
+#                                  by grade_key(grade)
+#   onTime, late                 - submitted on/before vs after the due date
+#   totalBytes                   - sum of fileSize
+# The write paths keep them current with $inc; rebuild_task_stats()
+# recomputes every rollup from the submissions collection.
+
+# Submission fields the rollups are computed from
+TASK_STATS_FIELDS = {"taskId": 1, "status": 1, "grade": 1, "submissionDate": 1, "fileSize": 1}
+
+
+def _due_date(task: Optional[dict]) -> Optional[datetime]:
+    # dueDate is a free-form string; ISO dates (YYYY-MM-DD...) are understood
+    try:
+        return datetime.strptime(task["dueDate"][:10], "%Y-%m-%d")
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def grade_key(grade) -> str:
+    # Grades are free text, but a field name may not contain "." or start
+    # with "$"; those (and "%", the escape itself) are percent-encoded.
+    # GRADE_KEY_EXPRESSION is the same encoding in the rebuild pipeline.
+    return str(grade).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def grade_from_key(key: str) -> str:
+    return unquote(key)
+
+
+def _counters(submission: Optional[dict], due: Optional[datetime]) -> Dict[str, int]:
+    if not submission:
+        return {}
+    graded = submission.get("status") == "graded"
+    counters = {"submissions": 1, "graded" if graded else "pending": 1, "totalBytes": submission.get("fileSize") or 0}
+    if graded and submission.get("grade"):
+        counters[f"grades.{grade_key(submission['grade'])}"] = 1
+    submitted = submission.get("submissionDate")
+    if due is not None and isinstance(submitted, datetime):
+        counters["onTime" if submitted.date() <= due.date() else "late"] = 1
+    return counters
+
+
+async def record_submission_changes(changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> None:
+    # Each change is (before, after) for one submission; None stands for
+    # "did not exist". Net deltas are folded per task and applied with one
+    # $inc per task in a single bulk write.
+    deltas: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for before, after in changes:
+        task_id = (after or before)["taskId"]
+        due = _due_date(await task_catalogue.get_task_doc(task_id))
+        for field, value in _counters(after, due).items():
+            deltas[task_id][field] += value
+        for field, value in _counters(before, due).items():
+            deltas[task_id][field] -= value
+    operations = []
+    for task_id, fields in deltas.items():
+        inc = {field: value for field, value in fields.items() if value}
+        if inc:
+            operations.append(UpdateOne(
+                {"_id": task_id},
+                {"$inc": inc, "$currentDate": {"updatedAt": True}},
+                upsert=True
+            ))
+    if operations:
+        await task_stats_repo.bulk_write(operations)
+
+
+async def record_submission_change(before: Optional[dict], after: Optional[dict]) -> None:
+    await record_submission_changes([(before, after)])
+
+
+GRADE_KEY_EXPRESSION = {"$replaceAll": {
+    "input": {"$replaceAll": {
+        "input": {"$replaceAll": {"input": {"$toString": "$_id.grade"}, "find": "%", "replacement": "%25"}},
+        "find": ".",
+        "replacement": "%2E",
+    }},
+    "find": {"$literal": "$"},
+    "replacement": "%24",
+}}
+
+TASK_STATS_PIPELINE = [
+    # Collapse to one row per task, status, grade and day first, so the task
+    # lookup below runs per group rather than per submission.
+    {"$group": {
+        "_id": {
+            "taskId": "$taskId",
+            "status": "$status",
+            "grade": "$grade",
+            "day": {"$dateTrunc": {"date": "$submissionDate", "unit": "day"}},
+        },
+        "count": {"$sum": 1},
+        "bytes": {"$sum": {"$ifNull": ["$fileSize", 0]}},
+    }},
+    {"$set": {"taskOid": {"$convert": {"input": "$_id.taskId", "to": "objectId", "onError": None, "onNull": None}}}},
+    {"$lookup": {
+        "from": "tasks",
+        "localField": "taskOid",
+        "foreignField": "_id",
+        "pipeline": [{"$project": {"dueDate": 1}}],
+        "as": "task",
+    }},
+    {"$set": {"due": {"$dateFromString": {
+        "dateString": {"$substrCP": [{"$ifNull": [{"$first": "$task.dueDate"}, ""]}, 0, 10]},
+        "format": "%Y-%m-%d",
+        "onError": None,
+        "onNull": None,
+    }}}},
+    {"$set": {
+        "onTime": {"$cond": [{"$and": [{"$ne": ["$due", None]}, {"$lte": ["$_id.day", "$due"]}]}, "$count", 0]},
+        "late": {"$cond": [{"$and": [{"$ne": ["$due", None]}, {"$gt": ["$_id.day", "$due"]}]}, "$count", 0]},
+    }},
+    {"$group": {
+        "_id": {"taskId": "$_id.taskId", "status": "$_id.status", "grade": "$_id.grade"},
+        "count": {"$sum": "$count"},
+        "bytes": {"$sum": "$bytes"},
+        "onTime": {"$sum": "$onTime"},
+        "late": {"$sum": "$late"},
+    }},
+    {"$group": {
+        "_id": "$_id.taskId",
+        "submissions": {"$sum": "$count"},
+        "pending": {"$sum": {"$cond": [{"$eq": ["$_id.status", "graded"]}, 0, "$count"]}},
+        "graded": {"$sum": {"$cond": [{"$eq": ["$_id.status", "graded"]}, "$count", 0]}},
+        "onTime": {"$sum": "$onTime"},
+        "late": {"$sum": "$late"},
+        "totalBytes": {"$sum": "$bytes"},
+        "grades": {"$push": {"$cond": [
+            {"$and": [{"$eq": ["$_id.status", "graded"]}, {"$gt": ["$_id.grade", None]}, {"$ne": ["$_id.grade", ""]}]},
+            {"k": GRADE_KEY_EXPRESSION, "v": "$count"},
+            "$$REMOVE",
+        ]}},
+    }},
+    {"$set": {"grades": {"$arrayToObject": "$grades"}, "updatedAt": "$$NOW"}},
+    # $out swaps the collection in atomically, so readers never see it empty
+    {"$out": "task_stats"},
+]
+
+
+async def rebuild_task_stats() -> None:
+    # Increments landing while the pipeline runs are overwritten by the swap,
+    # so run it during a quiet period.
+    async for _ in submissions_repo.aggregate(TASK_STATS_PIPELINE):
+        pass
+
+
+def empty_task_stats(task_id: str) -> dict:
+    return {
+        "taskId": task_id, "submissions": 0, "pending": 0, "graded": 0,
+        "grades": {}, "onTime": 0, "late": 0, "totalBytes": 0,
+    }
+
+
+async def get_all_task_stats() -> list:
+    # One entry per catalogue task, in catalogue order
+    catalogue = await task_catalogue.get()
+    stats = {doc["_id"]: doc async for doc in task_stats_repo.find({}, {"updatedAt": 0})}
+    result = []
+    for task in catalogue.tasks:
+        entry = empty_task_stats(task["id"])
+        doc = stats.get(task["id"])
+        if doc:
+            entry.update({key: value for key, value in doc.items() if key != "_id"})
+            entry["grades"] = {grade_from_key(key): count for key, count in entry["grades"].items()}
+        entry["taskTitle"] = task["title"]
+        entry["dueDate"] = task["dueDate"]
+        result.append(entry)
+    return result
+
+
+if __name__ == "__main__":
+    # Rebuild command: python task_stats.py
+    async def _main():
+        started = datetime.utcnow()
+        await rebuild_task_stats()
+        count = await task_stats_repo.collection.count_documents({})
+        print(f"rebuilt {count} task rollups in {(datetime.utcnow() - started).total_seconds():.1f}s")
+
+    asyncio.run(_main())
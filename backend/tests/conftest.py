@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# auth refuses to import without a signing key
+os.environ.setdefault("JWT_SECRET", "test-secret")
+# Cheap hashes keep signup and login fast
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+# Tests that need MongoDB run against this server, each in a scratch database
+# that is dropped afterwards; without it they are skipped.
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+
+
+# Async tests run on anyio's pytest plugin (installed with Starlette)
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    if not MONGO_TEST_URI:
+        pytest.skip("MONGO_TEST_URI is not set")
+    import auth
+    import database
+    from catalogue import task_catalogue
+    from indexes import ensure_indexes
+
+    monkeypatch.setenv("MONGO_URI", MONGO_TEST_URI)
+    monkeypatch.setattr(database, "DATABASE_NAME", f"eduquest_test_{uuid.uuid4().hex[:12]}")
+    await database.mongo.close()
+    test_db = database.mongo.open()
+    await ensure_indexes(test_db)
+    # Module-level caches would otherwise carry state between databases
+    task_catalogue.version = None
+    task_catalogue._checked_at = 0.0
+    task_catalogue._lock = asyncio.Lock()
+    auth._profile_cache._data.clear()
+    try:
+        yield test_db
+    finally:
+        await database.mongo.client.drop_database(test_db.name)
+        await database.mongo.close()
+
+
+@pytest.fixture
+async def client(db):
+    import httpx
+    from main import app
+
+    # The db fixture stands in for the lifespan
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http_client:
+        yield http_client
@@ -0,0 +1,64 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+
+import pytest
+
+import archive
+
+TEXT = b"print('hello')\n" * 5000
+RANDOM = os.urandom(200_000)
+
+
+async def _submissions(docs):
+    for doc in docs:
+        yield doc
+
+
+async def _collect(docs) -> zipfile.ZipFile:
+    body = b"".join([chunk async for chunk in archive.stream_submissions_zip(_submissions(docs))])
+    return zipfile.ZipFile(io.BytesIO(body))
+
+
+@pytest.fixture
+def bodies(monkeypatch):
+    files = {"text": TEXT, "random": RANDOM, "old": TEXT}
+
+    async def iter_file_body(submission):
+        body = files[submission["fileId"]]
+        for offset in range(0, len(body), 64 * 1024):
+            yield body[offset:offset + 64 * 1024]
+
+    monkeypatch.setattr(archive, "iter_file_body", iter_file_body)
+
+
+def _doc(student, file_id, **fields):
+    return {
+        "studentId": student, "fileName": "work.bin", "fileId": file_id, "fileStore": "gridfs",
+        "fileSize": len(TEXT if file_id != "random" else RANDOM), "submissionDate": datetime(2025, 1, 2), **fields,
+    }
+
+
+@pytest.mark.anyio
+async def test_archive_stores_incompressible_files_and_deflates_the_rest(bodies):
+    result = await _collect([
+        _doc("a@example.com", "text", fileEncoding="zstd"),
+        _doc("b@example.com", "random", fileEncoding=None),
+        # Stored before compression existed: no fileEncoding field at all
+        _doc("c@example.com", "old"),
+    ])
+    entries = {info.filename: info for info in result.infolist()}
+    assert entries["a@example.com/work.bin"].compress_type == zipfile.ZIP_DEFLATED
+    assert entries["b@example.com/work.bin"].compress_type == zipfile.ZIP_STORED
+    assert entries["c@example.com/work.bin"].compress_type == zipfile.ZIP_DEFLATED
+    assert result.read("a@example.com/work.bin") == TEXT
+    assert result.read("b@example.com/work.bin") == RANDOM
+    assert result.read("c@example.com/work.bin") == TEXT
+    assert result.testzip() is None
+
+
+@pytest.mark.anyio
+async def test_archive_deduplicates_entry_names(bodies):
+    result = await _collect([_doc("a@example.com", "text", fileEncoding=None)] * 2)
+    assert result.namelist() == ["a@example.com/work.bin", "a@example.com/work (2).bin"]
@@ -0,0 +1,100 @@
+import pytest
+
+import main
+from catalogue import task_catalogue
+
+pytestmark = pytest.mark.anyio
+
+STUDENT = {"name": "Student", "email": "student@example.com", "password": "secret", "role": "student"}
+TASK = {"title": "Task", "description": "Do it", "dueDate": "2025-01-01"}
+BODY = b"the same essay, handed in twice"
+
+
+async def _setup(client):
+    await client.post("/signup", json=STUDENT)
+    response = await client.post("/login", json={"email": STUDENT["email"], "password": STUDENT["password"]})
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    task_ids = []
+    for n in range(2):
+        response = await client.post("/tasks", json={**TASK, "dueDate": f"2025-01-0{n + 1}"})
+        task_ids.append(response.json()["id"])
+    await task_catalogue.get(force_check=True)
+    return headers, task_ids
+
+
+async def _submit(client, task_id, body, headers):
+    response = await client.post(
+        f"/tasks/{task_id}/submit",
+        data={"task_title": "Task"},
+        files={"file": ("work.txt", body)},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def _replace(client, submission_id, body, headers):
+    return await client.put(
+        f"/submissions/{submission_id}/replace",
+        data={"task_title": "Task"},
+        files={"file": ("work.txt", body)},
+        headers=headers,
+    )
+
+
+async def _stored_files(db) -> int:
+    return await db["submission_files.files"].count_documents({})
+
+
+async def test_duplicate_upload_shares_one_body(client, db):
+    headers, task_ids = await _setup(client)
+    await _submit(client, task_ids[0], BODY, headers)
+    await _submit(client, task_ids[1], BODY, headers)
+
+    assert len(await db.submissions.distinct("fileId")) == 1
+    blob = await db.blobs.find_one({})
+    assert blob["refCount"] == 2
+    assert await _stored_files(db) == 1
+
+
+async def test_replace_releases_the_previous_body(client, db):
+    headers, task_ids = await _setup(client)
+    first = await _submit(client, task_ids[0], BODY, headers)
+    await _submit(client, task_ids[1], BODY, headers)
+
+    response = await _replace(client, first["id"], b"a different essay", headers)
+    assert response.status_code == 200, response.text
+    counts = {blob["size"]: blob["refCount"] async for blob in db.blobs.find({})}
+    assert counts == {len(BODY): 1, len(b"a different essay"): 1}
+
+
+async def test_deleting_the_last_reference_deletes_the_body(client, db):
+    headers, task_ids = await _setup(client)
+    first = await _submit(client, task_ids[0], BODY, headers)
+    second = await _submit(client, task_ids[1], BODY, headers)
+
+    await client.delete(f"/submissions/{first['id']}")
+    assert (await db.blobs.find_one({}))["refCount"] == 1
+    assert await _stored_files(db) == 1
+
+    await client.delete(f"/submissions/{second['id']}")
+    assert await db.blobs.count_documents({}) == 0
+    assert await _stored_files(db) == 0
+
+
+async def test_failed_replace_releases_the_new_reference(client, db, monkeypatch):
+    headers, task_ids = await _setup(client)
+    submission = await _submit(client, task_ids[0], BODY, headers)
+
+    async def failing_update(*args, **kwargs):
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(main.submissions_repo, "find_one_and_update", failing_update)
+    with pytest.raises(RuntimeError):
+        await _replace(client, submission["id"], BODY, headers)
+    assert (await db.blobs.find_one({}))["refCount"] == 1
+
+    with pytest.raises(RuntimeError):
+        await _replace(client, submission["id"], b"never stored for long", headers)
+    assert await db.blobs.count_documents({}) == 1
+    assert await _stored_files(db) == 1
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from compression import DEFLATE, ZSTD, compress_chunks, decompress_chunks
+from storage import CHUNK_SIZE
+
+pytestmark = pytest.mark.anyio
+
+# Zeros compress by three orders of magnitude: one stored chunk holds far
+# more than CHUNK_SIZE of body
+BODY = bytes(40 * 1024 * 1024) + os.urandom(1024)
+
+
+async def _stored(body: bytes, encoding: str) -> list:
+    async def chunks():
+        for offset in range(0, len(body), CHUNK_SIZE):
+            yield body[offset:offset + CHUNK_SIZE]
+
+    compressed = b"".join([chunk async for chunk in compress_chunks(chunks(), encoding)])
+    return [compressed[offset:offset + CHUNK_SIZE] for offset in range(0, len(compressed), CHUNK_SIZE)]
+
+
+async def _decoded(stored: list, encoding: str, start: int = 0, end=None) -> list:
+    async def chunks():
+        for chunk in stored:
+            yield chunk
+
+    return [chunk async for chunk in decompress_chunks(chunks(), encoding, start, end, CHUNK_SIZE)]
+
+
+@pytest.mark.parametrize("encoding", [ZSTD, DEFLATE])
+async def test_decoded_chunks_stay_bounded_whatever_the_ratio(encoding):
+    stored = await _stored(BODY, encoding)
+    assert len(stored) == 1
+    decoded = await _decoded(stored, encoding)
+    assert max(len(chunk) for chunk in decoded) <= CHUNK_SIZE
+    assert b"".join(decoded) == BODY
+
+
+@pytest.mark.parametrize("encoding", [ZSTD, DEFLATE])
+async def test_ranges_are_cut_from_the_decoded_body(encoding):
+    stored = await _stored(BODY, encoding)
+    start, end = len(BODY) - 1536, len(BODY) - 512
+    assert b"".join(await _decoded(stored, encoding, start, end)) == BODY[start:end]
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+
+import main
+from auth import Principal, get_stream_principal
+
+pytestmark = pytest.mark.anyio
+
+STUDENT = Principal(id="1", email="student@example.com", name="Student", role="student")
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as http_client:
+        yield http_client
+
+
+@pytest.fixture
+def as_student():
+    async def student():
+        return STUDENT
+
+    main.app.dependency_overrides[get_stream_principal] = student
+    yield
+    main.app.dependency_overrides.pop(get_stream_principal)
+
+
+async def test_anonymous_callers_get_no_feed(client):
+    response = await client.get("/events")
+    assert response.status_code == 401
+    response = await client.get("/events", params={"studentId": STUDENT.email})
+    assert response.status_code == 401
+
+
+async def test_invalid_query_token_is_rejected(client):
+    response = await client.get("/events", params={"access_token": "not-a-token"})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("params", [{"studentId": "other@example.com"}, {"taskId": "0" * 24}])
+async def test_students_cannot_follow_other_feeds(client, as_student, params):
+    response = await client.get("/events", params=params)
+    assert response.status_code == 403
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from http_helpers import http_date, is_not_modified, parse_range
+
+ETAG = '"abc-100"'
+SIZE = 100
+
+
+def make_request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_no_range_serves_whole_body():
+    assert parse_range(make_request(), SIZE, ETAG) is None
+
+
+def test_closed_range():
+    assert parse_range(make_request(range="bytes=10-19"), SIZE, ETAG) == (10, 20)
+
+
+def test_closed_range_past_end_is_clamped():
+    assert parse_range(make_request(range="bytes=90-500"), SIZE, ETAG) == (90, 100)
+
+
+def test_open_ended_range():
+    assert parse_range(make_request(range="bytes=40-"), SIZE, ETAG) == (40, 100)
+
+
+def test_suffix_range():
+    assert parse_range(make_request(range="bytes=-30"), SIZE, ETAG) == (70, 100)
+
+
+def test_suffix_range_longer_than_body():
+    assert parse_range(make_request(range="bytes=-500"), SIZE, ETAG) == (0, 100)
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=50-10", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(HTTPException) as excinfo:
+        parse_range(make_request(range=header), SIZE, ETAG)
+    assert excinfo.value.status_code == 416
+    assert excinfo.value.headers["Content-Range"] == "bytes */100"
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-9", "items=0-9", "bytes=-", "bytes=a-b"])
+def test_unsupported_range_falls_back_to_full_body(header):
+    assert parse_range(make_request(range=header), SIZE, ETAG) is None
+
+
+def test_if_range_matching_etag_honours_range():
+    request = make_request(range="bytes=0-9", if_range=ETAG)
+    assert parse_range(request, SIZE, ETAG) == (0, 10)
+
+
+def test_stale_if_range_serves_whole_body():
+    request = make_request(range="bytes=0-9", if_range='"abc-99"')
+    assert parse_range(request, SIZE, ETAG) is None
+
+
+def test_weak_if_range_never_matches():
+    # If-Range requires the strong comparison
+    request = make_request(range="bytes=0-9", if_range=f"W/{ETAG}")
+    assert parse_range(request, SIZE, ETAG) is None
+
+
+def test_if_none_match_strong_tag():
+    assert is_not_modified(make_request(if_none_match=ETAG), ETAG)
+
+
+def test_if_none_match_weak_tag():
+    # If-None-Match uses the weak comparison
+    assert is_not_modified(make_request(if_none_match=f"W/{ETAG}"), ETAG)
+
+
+def test_if_none_match_list_and_wildcard():
+    assert is_not_modified(make_request(if_none_match=f'"other", {ETAG}'), ETAG)
+    assert is_not_modified(make_request(if_none_match="*"), ETAG)
+
+
+def test_if_none_match_mismatch():
+    assert not is_not_modified(make_request(if_none_match='"other"'), ETAG)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    modified = datetime(2025, 1, 1, 12, 0, 0)
+    request = make_request(if_none_match='"other"', if_modified_since=http_date(modified))
+    assert not is_not_modified(request, ETAG, modified)
+
+
+def test_if_modified_since():
+    modified = datetime(2025, 1, 1, 12, 0, 0, 500000)
+    # HTTP dates have whole-second precision
+    assert is_not_modified(make_request(if_modified_since=http_date(modified)), ETAG, modified)
+    earlier = http_date(datetime(2024, 12, 31))
+    assert not is_not_modified(make_request(if_modified_since=earlier), ETAG, modified)
+    assert not is_not_modified(make_request(if_modified_since="not a date"), ETAG, modified)
@@ -0,0 +1,59 @@
+import anyio
+import pytest
+from prometheus_client import REGISTRY
+
+from observability import RequestMetricsMiddleware
+
+CHUNK_DELAY = 0.05
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def _streaming_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    for _ in range(3):
+        await anyio.sleep(CHUNK_DELAY)
+        await send({"type": "http.response.body", "body": b"chunk", "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _failing_app(scope, receive, send):
+    raise RuntimeError("boom")
+
+
+async def _call(app, method):
+    in_progress_while_streaming = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            in_progress_while_streaming.append(_sample("http_requests_in_progress", {"method": method}))
+
+    scope = {"type": "http", "method": method, "path": "/stream", "headers": [], "client": ("127.0.0.1", 1)}
+    await RequestMetricsMiddleware(app)(scope, receive, send)
+    return in_progress_while_streaming
+
+
+@pytest.mark.anyio
+async def test_streamed_responses_are_timed_until_the_last_chunk():
+    labels = {"method": "PATCH", "route": "unmatched", "status": "200"}
+    before = _sample("http_request_duration_seconds_sum", labels)
+    in_progress = await _call(_streaming_app, "PATCH")
+    # Still in progress while the body streams, including after the last chunk was handed over
+    assert in_progress == [1.0] * 4
+    assert _sample("http_requests_in_progress", {"method": "PATCH"}) == 0.0
+    assert _sample("http_request_duration_seconds_sum", labels) - before >= 3 * CHUNK_DELAY
+
+
+@pytest.mark.anyio
+async def test_failed_requests_are_recorded_once_as_errors():
+    labels = {"method": "OPTIONS", "route": "unmatched", "status": "500"}
+    before = _sample("http_request_duration_seconds_count", labels)
+    with pytest.raises(RuntimeError):
+        await _call(_failing_app, "OPTIONS")
+    assert _sample("http_requests_in_progress", {"method": "OPTIONS"}) == 0.0
+    assert _sample("http_request_duration_seconds_count", labels) - before == 1
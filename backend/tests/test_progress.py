@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import progress
+from progress import ProgressConflictError, _completion_write, _next_unlocks, empty_progress
+
+STUDENT = "student@example.com"
+LOCKED = [
+    {"id": str(ObjectId(f"{n:024x}")), "dueDate": due}
+    for n, due in ((1, "2025-01-01"), (2, "2025-01-01"), (3, "2025-02-01"), (4, "2025-03-01"))
+]
+
+
+def test_next_unlocks_without_frontier():
+    assert _next_unlocks(LOCKED, None, 2) == LOCKED[:2]
+
+
+def test_next_unlocks_past_frontier_breaks_due_date_ties_by_id():
+    frontier = {"dueDate": LOCKED[0]["dueDate"], "taskId": ObjectId(LOCKED[0]["id"])}
+    assert _next_unlocks(LOCKED, frontier, 2) == LOCKED[1:3]
+
+
+def test_next_unlocks_runs_out():
+    frontier = {"dueDate": LOCKED[3]["dueDate"], "taskId": ObjectId(LOCKED[3]["id"])}
+    assert _next_unlocks(LOCKED, frontier, 3) == []
+
+
+def test_completion_write_unlocks_one_task_per_new_completion():
+    filter, update, unlocked = _completion_write(empty_progress(STUDENT), ["t1", "t2", "t1"], LOCKED)
+    assert unlocked == [LOCKED[0]["id"], LOCKED[1]["id"]]
+    assert filter == {"_id": STUDENT, "frontier": None, "completedTaskIds": {"$nin": ["t1", "t2"]}}
+    assert update["$addToSet"]["completedTaskIds"] == {"$each": ["t1", "t2"]}
+    assert update["$set"]["frontier"] == {"dueDate": "2025-01-01", "taskId": ObjectId(LOCKED[1]["id"])}
+
+
+def test_completion_write_skips_completed_tasks():
+    progress = {**empty_progress(STUDENT), "completedTaskIds": ["t1"]}
+    assert _completion_write(progress, ["t1"], LOCKED) is None
+    _, update, unlocked = _completion_write(progress, ["t1", "t2"], LOCKED)
+    assert update["$addToSet"]["completedTaskIds"] == {"$each": ["t2"]}
+    assert len(unlocked) == 1
+
+
+def test_completion_write_without_tasks_left_to_unlock():
+    progress = {**empty_progress(STUDENT), "frontier": {"dueDate": "2025-03-01", "taskId": ObjectId(LOCKED[3]["id"])}}
+    _, update, unlocked = _completion_write(progress, ["t9"], LOCKED)
+    assert unlocked == []
+    assert "$set" not in update
+
+
+@pytest.fixture
+def always_conflicting(monkeypatch):
+    # Every conditional upsert loses to a concurrent update
+    async def catalogue():
+        return SimpleNamespace(locked_tasks=LOCKED)
+
+    async def no_progress(student_id):
+        return empty_progress(student_id)
+
+    async def conflict(*args, **kwargs):
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+    async def nothing_stored(*args, **kwargs):
+        for doc in ():
+            yield doc
+
+    monkeypatch.setattr(progress.task_catalogue, "get", catalogue)
+    monkeypatch.setattr(progress, "get_progress", no_progress)
+    monkeypatch.setattr(progress.progress_repo, "update_one", conflict)
+    monkeypatch.setattr(progress.progress_repo, "find", nothing_stored)
+
+
+@pytest.mark.anyio
+async def test_record_completions_raises_once_retries_run_out(always_conflicting):
+    with pytest.raises(ProgressConflictError):
+        await progress.record_completions(STUDENT, ["t1"])
+
+
+@pytest.mark.anyio
+async def test_record_completions_many_reports_students_whose_retries_ran_out(always_conflicting, monkeypatch):
+    async def conflicting_bulk_write(operations, ordered=False):
+        raise progress.BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000"}]})
+
+    monkeypatch.setattr(progress.progress_repo, "bulk_write", conflicting_bulk_write)
+    errors = await progress.record_completions_many({STUDENT: ["t1"]})
+    assert STUDENT in errors
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+
+import repository
+from database import progress_repo, submissions_repo, tasks_repo, users_repo
+from dashboard import get_student_dashboard
+from progress import record_completions
+from repository import CollectionScanError, _has_collscan, _winning_plans
+
+STUDENT = "student@example.com"
+
+
+def test_winning_plans_skip_rejected_plans():
+    explanation = {"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+        "rejectedPlans": [{"stage": "COLLSCAN"}],
+    }}
+    plans = list(_winning_plans(explanation))
+    assert len(plans) == 1
+    assert not any(_has_collscan(plan) for plan in plans)
+
+
+def test_winning_plans_found_inside_aggregate_stages():
+    explanation = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "PROJECTION_SIMPLE", "inputStage": {"stage": "COLLSCAN"}}}}},
+        {"$group": {}},
+    ]}
+    assert any(_has_collscan(plan) for plan in _winning_plans(explanation))
+
+
+@pytest.fixture
+def guarded(db, monkeypatch):
+    monkeypatch.setattr(repository, "QUERY_PLAN_GUARD", True)
+    return db
+
+
+async def _seed():
+    task_ids = []
+    for day in range(1, 4):
+        task_ids.append(str(await tasks_repo.insert_one({
+            "title": f"Task {day}", "description": "", "dueDate": f"2025-01-0{day}", "isLocked": day > 1,
+        })))
+    await users_repo.insert_one({"name": "Student", "email": STUDENT, "password": "x", "role": "student"})
+    submission_id = await submissions_repo.insert_one({
+        "taskId": task_ids[0], "taskTitle": "Task 1", "studentId": STUDENT, "studentName": "Student",
+        "submissionDate": datetime(2025, 1, 1), "fileName": "a.txt", "fileSize": 1, "status": "pending",
+    })
+    return task_ids, submission_id
+
+
+@pytest.mark.anyio
+async def test_application_queries_use_indexes(guarded):
+    task_ids, submission_id = await _seed()
+
+    assert await users_repo.find_one({"email": STUDENT})
+    await users_repo.find_list({"role": "student"})
+    await submissions_repo.find_list(
+        {"taskId": task_ids[0], "studentId": STUDENT}, sort=[("submissionDate", -1), ("_id", -1)]
+    )
+    await submissions_repo.find_list({"studentId": STUDENT}, sort=[("submissionDate", -1), ("_id", -1)])
+    await submissions_repo.find_list({"status": "pending"}, sort=[("submissionDate", -1), ("_id", -1)])
+    await submissions_repo.find_one_and_update({"_id": submission_id}, {"$set": {"grade": "A"}})
+    await submissions_repo.bulk_write([UpdateOne({"_id": submission_id}, {"$set": {"status": "graded"}})])
+    assert await record_completions(STUDENT, [task_ids[0]]) == [task_ids[1]]
+    assert await progress_repo.find_one({"_id": STUDENT})
+    dashboard = await get_student_dashboard(STUDENT)
+    assert [task["id"] for task in dashboard["tasks"]] == task_ids
+    assert await submissions_repo.find_one_and_delete({"_id": submission_id})
+    await tasks_repo.delete_one({"_id": ObjectId(task_ids[2])})
+
+
+@pytest.mark.anyio
+async def test_unindexed_queries_are_rejected(guarded):
+    await _seed()
+    with pytest.raises(CollectionScanError):
+        await users_repo.find_one({"name": "Student"})
+    with pytest.raises(CollectionScanError):
+        await users_repo.update_one({"name": "Student"}, {"$set": {"role": "teacher"}})
+    with pytest.raises(CollectionScanError):
+        await submissions_repo.bulk_write([UpdateOne({"fileName": "a.txt"}, {"$set": {"status": "graded"}})])
+    with pytest.raises(CollectionScanError):
+        async for _ in submissions_repo.aggregate([{"$match": {"fileName": "a.txt"}}]):
+            pass
+
+
+@pytest.mark.anyio
+async def test_unfiltered_reads_are_not_checked(guarded):
+    await _seed()
+    assert len(await tasks_repo.find_list()) == 3
+    async for _ in submissions_repo.aggregate([{"$group": {"_id": "$taskId"}}]):
+        pass
@@ -0,0 +1,139 @@
+import os
+
+import pytest
+
+import catalogue
+from catalogue import task_catalogue
+from repository import count_round_trips
+
+# Database round trips per mutating endpoint, with the task catalogue and the
+# caller's profile already cached. Trips a write cannot avoid:
+#   tasks        - the write, plus the catalogue version bump every worker polls
+#   submit       - blob reference, submission insert, task_stats $inc; a body
+#                  not stored before adds the GridFS write (index probe on
+#                  files and chunks, chunk insert, files insert) and the blob
+#                  insert
+#   replace      - blob reference, the swap, releasing the previous blob,
+#                  task_stats $inc
+#   delete       - the delete, releasing the blob, task_stats $inc
+#   grade        - the update and task_stats $inc; a passing grade adds the
+#                  progress read and upsert
+#   bulk grade   - constant in the number of grades and students
+pytestmark = pytest.mark.anyio
+
+TEACHER = {"name": "Teacher", "email": "teacher@example.com", "password": "secret", "role": "teacher"}
+STUDENTS = [
+    {"name": f"Student {n}", "email": f"student{n}@example.com", "password": "secret", "role": "student"}
+    for n in range(3)
+]
+TASK = {"title": "Task", "description": "Do it", "dueDate": "2025-01-01"}
+
+
+@pytest.fixture(autouse=True)
+def cached_catalogue(monkeypatch):
+    # Trust the cached catalogue for the whole test instead of one second
+    monkeypatch.setattr(catalogue, "VERSION_CHECK_SECONDS", 3600.0)
+
+
+async def _counted(request):
+    with count_round_trips() as counter:
+        response = await request
+    assert response.status_code < 400, response.text
+    return response, counter.commands
+
+
+async def _signup_and_login(client, user) -> dict:
+    await client.post("/signup", json=user)
+    response = await client.post("/login", json={"email": user["email"], "password": user["password"]})
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+async def _submit(client, task_id, body, headers):
+    return await client.post(
+        f"/tasks/{task_id}/submit",
+        data={"task_title": "Task"},
+        files={"file": ("work.txt", body)},
+        headers=headers,
+    )
+
+
+async def _setup(client):
+    headers = {student["email"]: await _signup_and_login(client, student) for student in STUDENTS}
+    task_ids = []
+    for n in range(3):
+        response = await client.post("/tasks", json={**TASK, "dueDate": f"2025-01-0{n + 1}", "isLocked": n > 0})
+        task_ids.append(response.json()["id"])
+    await task_catalogue.get(force_check=True)
+    # The first upload creates the GridFS indexes; keep that out of the counts
+    await _submit(client, task_ids[2], b"warm-up", headers[STUDENTS[0]["email"]])
+    return headers, task_ids
+
+
+async def test_signup(client):
+    _, commands = await _counted(client.post("/signup", json=TEACHER))
+    assert commands == ["insert"]
+
+
+async def test_task_writes(client):
+    await task_catalogue.get(force_check=True)
+    response, commands = await _counted(client.post("/tasks", json=TASK))
+    assert commands == ["insert", "update"]
+    task_id = response.json()["id"]
+
+    _, commands = await _counted(client.put(f"/tasks/{task_id}", json={"title": "Renamed"}))
+    assert commands == ["findAndModify", "update"]
+
+    _, commands = await _counted(client.delete(f"/tasks/{task_id}"))
+    assert commands == ["delete", "update"]
+
+
+async def test_submission_writes(client):
+    headers, task_ids = await _setup(client)
+    student = STUDENTS[0]
+    auth = headers[student["email"]]
+
+    # New body: GridFS write and blob insert on top of the three fixed trips
+    response, commands = await _counted(_submit(client, task_ids[0], os.urandom(4096), auth))
+    assert commands == ["findAndModify", "find", "find", "insert", "insert", "insert", "insert", "update"]
+    submission_id = response.json()["id"]
+
+    # Body already stored (the warm-up upload): only the fixed trips
+    response, commands = await _counted(_submit(client, task_ids[1], b"warm-up", auth))
+    assert commands == ["findAndModify", "insert", "update"]
+    duplicate_id = response.json()["id"]
+
+    # Replace with a stored body; the previous blob keeps other references
+    _, commands = await _counted(client.put(
+        f"/submissions/{duplicate_id}/replace",
+        data={"task_title": "Task"},
+        files={"file": ("work.txt", b"warm-up")},
+        headers=auth,
+    ))
+    assert commands == ["findAndModify", "findAndModify", "findAndModify", "update"]
+
+    _, commands = await _counted(client.put(f"/submissions/{duplicate_id}/grade", json={"grade": "C"}))
+    assert commands == ["findAndModify", "update"]
+
+    # A passing grade also records the completion and unlock
+    _, commands = await _counted(client.put(f"/submissions/{submission_id}/grade", json={"grade": "A"}))
+    assert commands == ["findAndModify", "update", "find", "update"]
+
+    # Deleting a submission whose blob other submissions still reference
+    _, commands = await _counted(client.delete(f"/submissions/{duplicate_id}"))
+    assert commands == ["findAndModify", "findAndModify", "update"]
+
+
+async def test_bulk_grading_is_constant_in_the_number_of_grades(client):
+    headers, task_ids = await _setup(client)
+    submission_ids = []
+    for student in STUDENTS:
+        for task_id in task_ids[:2]:
+            response = await _submit(client, task_id, os.urandom(1024), headers[student["email"]])
+            submission_ids.append(response.json()["id"])
+
+    grades = [{"submission_id": submission_id, "grade": "A"} for submission_id in submission_ids]
+    response, commands = await _counted(client.put("/submissions/grades", json={"grades": grades}))
+    assert response.json()["graded"] == len(grades)
+    # The grades, graded submissions with their replaced state, clearing that
+    # state, task_stats, progress read, progress upserts
+    assert commands == ["update", "find", "update", "update", "find", "update"]
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+from database import submissions_repo
+from serializers import SUBMISSION_RESPONSE_PROJECTION, format_submission_date, submission_helper
+
+DATES = [
+    datetime(2025, 3, 1, 9, 30, 0),
+    datetime(2025, 3, 1, 9, 30, 0, 120000),
+    # Written straight from datetime.utcnow(): finer than MongoDB keeps
+    datetime(2025, 3, 1, 9, 30, 0, 123456),
+    datetime(2025, 3, 1, 9, 30, 0, 999),
+]
+
+
+def test_format_submission_date():
+    assert format_submission_date(DATES[0]) == "2025-03-01T09:30:00"
+    assert format_submission_date(DATES[1]) == "2025-03-01T09:30:00.120000"
+    assert format_submission_date(DATES[2]) == "2025-03-01T09:30:00.123000"
+    assert format_submission_date(DATES[3]) == "2025-03-01T09:30:00"
+    assert format_submission_date("2025-03-01") == "2025-03-01"
+
+
+def _submission(submission_date) -> dict:
+    return {
+        "taskId": "t1", "taskTitle": "Task", "studentId": "s@example.com", "studentName": "Student",
+        "submissionDate": submission_date, "fileName": "a.txt", "fileSize": 3, "status": "pending",
+    }
+
+
+@pytest.mark.anyio
+async def test_listing_projection_matches_submission_helper(db):
+    # The write paths answer with submission_helper over the document they
+    # just wrote; listings are shaped by the projection on the server.
+    written = []
+    for submission_date in DATES + ["2025-03-01"]:
+        submission = _submission(submission_date)
+        submission["_id"] = await submissions_repo.insert_one(submission)
+        written.append(submission)
+    listed = {
+        doc["id"]: doc async for doc in submissions_repo.find({"taskId": "t1"}, SUBMISSION_RESPONSE_PROJECTION)
+    }
+    for submission in written:
+        assert listed[str(submission["_id"])] == submission_helper(submission)
+        stored = await submissions_repo.find_one({"_id": submission["_id"]})
+        assert listed[str(submission["_id"])] == submission_helper(stored)
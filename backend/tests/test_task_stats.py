@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+
+import main
+import task_stats
+from catalogue import task_catalogue
+from task_stats import _counters, grade_from_key, grade_key, rebuild_task_stats
+
+STUDENT = {"name": "Student", "email": "student@example.com", "password": "secret", "role": "student"}
+TASK = {"title": "Task", "description": "Do it", "dueDate": "2025-01-01"}
+
+
+def test_grade_keys_are_valid_field_names_and_round_trip():
+    for grade in ["A", "B+", "7.5", "$100", "50%", "%2E", "a.b$c"]:
+        key = grade_key(grade)
+        assert "." not in key and not key.startswith("$")
+        assert grade_from_key(key) == grade
+
+
+def test_counters_key_grades_by_encoded_name():
+    submission = {"status": "graded", "grade": "7.5", "submissionDate": datetime(2025, 1, 1), "fileSize": 10}
+    counters = _counters(submission, datetime(2025, 1, 2))
+    assert counters == {"submissions": 1, "graded": 1, "totalBytes": 10, "grades.7%2E5": 1, "onTime": 1}
+
+
+async def _graded_submissions(client, grades):
+    await client.post("/signup", json=STUDENT)
+    response = await client.post("/login", json={"email": STUDENT["email"], "password": STUDENT["password"]})
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    response = await client.post("/tasks", json=TASK)
+    task_id = response.json()["id"]
+    await task_catalogue.get(force_check=True)
+    submission_ids = []
+    for _ in grades:
+        response = await client.post(
+            f"/tasks/{task_id}/submit", data={"task_title": "Task"}, files={"file": ("work.txt", b"x")}, headers=headers
+        )
+        submission_ids.append(response.json()["id"])
+    for submission_id, grade in zip(submission_ids, grades):
+        await client.put(f"/submissions/{submission_id}/grade", json={"grade": grade})
+    return submission_ids
+
+
+async def _grades(client) -> dict:
+    # $inc leaves grades that were moved away from at zero
+    response = await client.get("/tasks/stats")
+    return {grade: count for grade, count in response.json()[0]["grades"].items() if count}
+
+
+@pytest.mark.anyio
+async def test_free_text_grades_are_counted_and_rebuilt_alike(client):
+    await _graded_submissions(client, ["7.5", "$5", "7.5"])
+    assert await _grades(client) == {"7.5": 2, "$5": 1}
+    await rebuild_task_stats()
+    assert await _grades(client) == {"7.5": 2, "$5": 1}
+
+
+@pytest.mark.anyio
+async def test_bulk_regrading_moves_counts_from_the_replaced_grade(client):
+    submission_ids = await _graded_submissions(client, ["C", "B"])
+    grades = [{"submission_id": submission_id, "grade": "A"} for submission_id in submission_ids]
+    response = await client.put("/submissions/grades", json={"grades": grades})
+    assert response.json()["graded"] == 2
+    assert await _grades(client) == {"A": 2}
+
+
+@pytest.mark.anyio
+async def test_overlapping_bulk_gradings_keep_rollups_exact(client, db, monkeypatch):
+    await client.post("/signup", json=STUDENT)
+    response = await client.post("/login", json={"email": STUDENT["email"], "password": STUDENT["password"]})
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    response = await client.post("/tasks", json=TASK)
+    task_id = response.json()["id"]
+    await task_catalogue.get(force_check=True)
+    response = await client.post(
+        f"/tasks/{task_id}/submit", data={"task_title": "Task"}, files={"file": ("work.txt", b"x")}, headers=headers
+    )
+    submission_id = response.json()["id"]
+
+    # A second bulk grading lands between the first one's write and read
+    find = main.submissions_repo.find
+    interleaved = []
+
+    async def find_after_regrade(*args, **kwargs):
+        if not interleaved:
+            interleaved.append(True)
+            response = await client.put("/submissions/grades", json={"grades": [{"submission_id": submission_id, "grade": "A"}]})
+            assert response.json()["results"][0]["warning"] is None
+        async for doc in find(*args, **kwargs):
+            yield doc
+
+    monkeypatch.setattr(main.submissions_repo, "find", find_after_regrade)
+    response = await client.put("/submissions/grades", json={"grades": [{"submission_id": submission_id, "grade": "C"}]})
+    assert response.json()["results"][0]["warning"] is None
+
+    stats = (await client.get("/tasks/stats")).json()[0]
+    assert (stats["pending"], stats["graded"]) == (0, 1)
+    assert await _grades(client) == {"A": 1}
+    assert await db.submissions.count_documents({"pendingGradings.0": {"$exists": True}}) == 0
+
+
+@pytest.mark.anyio
+async def test_failed_rollup_does_not_fail_a_saved_submission(client, db, monkeypatch):
+    await client.post("/signup", json=STUDENT)
+    response = await client.post("/login", json={"email": STUDENT["email"], "password": STUDENT["password"]})
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    response = await client.post("/tasks", json=TASK)
+    task_id = response.json()["id"]
+    await task_catalogue.get(force_check=True)
+
+    async def failing_bulk_write(*args, **kwargs):
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(task_stats.task_stats_repo, "bulk_write", failing_bulk_write)
+    response = await client.post(
+        f"/tasks/{task_id}/submit", data={"task_title": "Task"}, files={"file": ("work.txt", b"x")}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    response = await client.put(f"/submissions/{response.json()['id']}/grade", json={"grade": "A"})
+    assert response.status_code == 200, response.text
+    assert await db.submissions.count_documents({}) == 1
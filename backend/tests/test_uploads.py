@@ -0,0 +1,64 @@
+import pytest
+from fastapi import HTTPException
+
+import uploads
+from storage import MAX_FILE_SIZE
+from uploads import UploadAdmissionMiddleware, upload_budget
+
+pytestmark = pytest.mark.anyio
+
+
+async def _call(content_length, body_chunks, app):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": n < len(body_chunks) - 1}
+        for n, chunk in enumerate(body_chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(b"content-type", b"multipart/form-data; boundary=x")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "method": "POST", "path": "/upload", "headers": headers}
+    await UploadAdmissionMiddleware(app)(scope, receive, send)
+    return sent
+
+
+def _reading_app(reserved):
+    async def app(scope, receive, send):
+        reserved.append(upload_budget.bytes_in_use)
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+async def test_large_uploads_reserve_only_what_stays_in_memory():
+    reserved = []
+    await _call(50 * 1024 * 1024, [b"x"], _reading_app(reserved))
+    assert reserved == [uploads._MAX_IN_MEMORY_BYTES]
+    assert upload_budget.bytes_in_use == 0
+
+
+async def test_small_uploads_reserve_their_declared_size():
+    reserved = []
+    await _call(2048, [b"x" * 2048], _reading_app(reserved))
+    assert reserved == [2048]
+
+
+async def test_oversized_declared_body_is_rejected_up_front():
+    sent = await _call(MAX_FILE_SIZE * 2, [b""], _reading_app([]))
+    assert sent[0]["status"] == 413
+
+
+async def test_body_past_its_declared_size_is_stopped():
+    with pytest.raises(HTTPException) as excinfo:
+        await _call(10, [b"x" * 8, b"x" * 8], _reading_app([]))
+    assert excinfo.value.status_code == 413
+    assert upload_budget.bytes_in_use == 0
@@ -0,0 +1,103 @@
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from observability import UPLOAD_BUDGET_BYTES_IN_USE, UPLOAD_BUDGET_UTILIZATION, UPLOADS_IN_PROGRESS, UPLOADS_REJECTED
+from storage import MAX_FILE_SIZE, file_too_large
+
+# Admission control for multipart uploads, applied before the body is read:
+# each upload reserves the memory its body can occupy while being parsed
+# against a per-process byte budget and a concurrency cap. Requests that do
+# not fit are turned away immediately instead of queueing up behind others.
+UPLOAD_BUDGET_BYTES = int(os.getenv("UPLOAD_BUDGET_MB", "32")) * 1024 * 1024
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", "32"))
+UPLOAD_RETRY_AFTER_SECONDS = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", "5"))
+# Room for the form fields and multipart framing around the file itself
+_FORM_OVERHEAD_BYTES = 64 * 1024
+MAX_UPLOAD_BODY = MAX_FILE_SIZE + _FORM_OVERHEAD_BYTES
+# Starlette's multipart parser keeps a file part in memory up to 1MB and
+# spools the rest to a temporary file, so no upload holds more than this
+_MAX_IN_MEMORY_BYTES = 1024 * 1024 + _FORM_OVERHEAD_BYTES
+
+
+class UploadBudget:
+    def __init__(self, limit_bytes: int, max_uploads: int):
+        self.limit_bytes = limit_bytes
+        self.max_uploads = max_uploads
+        self.bytes_in_use = 0
+        self.uploads = 0
+
+    def try_acquire(self, size: int) -> Optional[str]:
+        # Returns the rejection reason, or None once the bytes are reserved.
+        # An idle process always admits one upload, however large.
+        if self.uploads >= self.max_uploads:
+            return "concurrency"
+        if self.uploads and self.bytes_in_use + size > self.limit_bytes:
+            return "budget"
+        self.uploads += 1
+        self.bytes_in_use += size
+        self._report(size, 1)
+        return None
+
+    def release(self, size: int) -> None:
+        self.uploads -= 1
+        self.bytes_in_use -= size
+        self._report(-size, -1)
+
+    def _report(self, size_delta: int, uploads_delta: int) -> None:
+        UPLOAD_BUDGET_BYTES_IN_USE.inc(size_delta)
+        UPLOADS_IN_PROGRESS.inc(uploads_delta)
+        UPLOAD_BUDGET_UTILIZATION.set(self.bytes_in_use / self.limit_bytes)
+
+
+upload_budget = UploadBudget(UPLOAD_BUDGET_BYTES, MAX_CONCURRENT_UPLOADS)
+
+
+class UploadAdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get("content-length", "")
+        declared = int(content_length) if content_length.isdigit() else None
+        if declared is not None and declared > MAX_UPLOAD_BODY:
+            UPLOADS_REJECTED.labels("too_large").inc()
+            return await JSONResponse({"detail": file_too_large().detail}, status_code=413)(scope, receive, send)
+
+        limit = declared if declared is not None else MAX_UPLOAD_BODY
+        reservation = min(limit, _MAX_IN_MEMORY_BYTES)
+        reason = upload_budget.try_acquire(reservation)
+        if reason:
+            UPLOADS_REJECTED.labels(reason).inc()
+            return await JSONResponse(
+                {"detail": "Too many uploads in progress, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(UPLOAD_RETRY_AFTER_SECONDS)}
+            )(scope, receive, send)
+
+        received = 0
+
+        async def counted_receive():
+            # Stops a body that outgrows its declared size (or a chunked
+            # upload past the limit) while it is still being parsed.
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    UPLOADS_REJECTED.labels("too_large").inc()
+                    raise file_too_large()
+            return message
+
+        try:
+            await self.app(scope, counted_receive, send)
+        finally:
+            upload_budget.release(reservation)
@@ -0,0 +1,51 @@
+import * as React from "react"
+
+export type FeedEvent = {
+  type: string
+  taskId?: string
+  taskIds?: string[]
+  studentId?: string
+  submissionId?: string
+  status?: string
+  grade?: string | null
+  feedback?: string | null
+  fileName?: string
+  fileSize?: number
+}
+
+const EVENT_TYPES = [
+  "submission.created",
+  "submission.replaced",
+  "submission.graded",
+  "submission.deleted",
+  "task.created",
+  "task.updated",
+  "task.deleted",
+  "task.unlocked",
+  "resync",
+]
+
+// Subscribes to the backend's change feed (Server-Sent Events) for a student
+// and/or task. The browser reconnects on its own after network errors.
+// EventSource cannot send headers, so the session token goes in the URL.
+export function useEventFeed(
+  scope: { studentId?: string; taskId?: string },
+  onEvent: (event: FeedEvent) => void
+) {
+  const handlerRef = React.useRef(onEvent)
+  handlerRef.current = onEvent
+
+  React.useEffect(() => {
+    const token = localStorage.getItem("token")
+    if (!token || (!scope.studentId && !scope.taskId)) return
+    const params = new URLSearchParams({ access_token: token })
+    if (scope.studentId) params.set("studentId", scope.studentId)
+    if (scope.taskId) params.set("taskId", scope.taskId)
+    const source = new EventSource(`http://localhost:8000/events?${params}`)
+    const listener = (message: MessageEvent) => {
+      handlerRef.current(JSON.parse(message.data))
+    }
+    EVENT_TYPES.forEach((type) => source.addEventListener(type, listener))
+    return () => source.close()
+  }, [scope.studentId, scope.taskId])
+}
@@ -47,37 +47,33 @@ export default function Dashboard() {
       setLoadingTasks(true);
       setLoadingSubmissions(true);
       try {
-        const response = await fetch("http://localhost:8000/tasks");
-        if (!response.ok) {
-          throw new Error("Failed to fetch tasks");
+        if (user?.email) {
+          // One request returns the tasks with this student's lock state and latest submissions
+          const response = await fetch(`http://localhost:8000/students/${encodeURIComponent(user.email)}/dashboard`);
+          if (!response.ok) {
+            throw new Error("Failed to fetch dashboard");
+          }
+          const data: { tasks: (TaskCardType & { latestSubmission?: Submission | null })[] } = await response.json();
+          setTasks(data.tasks);
+          setStudentSubmissions(
+            data.tasks.flatMap(task => (task.latestSubmission ? [task.latestSubmission] : []))
+          );
+        } else {
+          const response = await fetch("http://localhost:8000/tasks");
+          if (!response.ok) {
+            throw new Error("Failed to fetch tasks");
+          }
+          const data: TaskCardType[] = await response.json();
+          setTasks(data);
+          setStudentSubmissions([]);
         }
-        const data: TaskCardType[] = await response.json();
-        setTasks(data);
       } catch (error) {
         console.error("Error fetching tasks:", error);
         toast({ title: "Error", description: "Could not load tasks.", variant: "destructive" });
         setTasks([]);
+        setStudentSubmissions([]);
       } finally {
         setLoadingTasks(false);
-      }
-
-      if (user?.email) {
-        try {
-          const submissionsResponse = await fetch(`http://localhost:8000/submissions?studentId=${user.email}`);
-          if (!submissionsResponse.ok) {
-            throw new Error("Failed to fetch student submissions");
-          }
-          const submissionsData: Submission[] = await submissionsResponse.json();
-          setStudentSubmissions(submissionsData);
-        } catch (error) {
-          console.error("Error fetching submissions:", error);
-          toast({ title: "Error", description: "Could not load your submission data.", variant: "destructive" });
-          setStudentSubmissions([]);
-        } finally {
-          setLoadingSubmissions(false);
-        }
-      } else {
-        setStudentSubmissions([]);
         setLoadingSubmissions(false);
       }
     };
@@ -50,21 +50,17 @@ export default function History() {
       setIsLoading(true);
       setError(null);
       try {
-        const response = await fetch("http://localhost:8000/submissions");
-        if (!response.ok) {
-          throw new Error("Failed to fetch submissions");
-        }
-        const allSubmissions = await response.json() as Submission[];
-
         // Get student identifier from localStorage
         const studentEmail = localStorage.getItem("userEmail");
         console.log("Student email from localStorage:", studentEmail);
         if (studentEmail) {
-          console.log("Student email from localStorage:", studentEmail);
           setCurrentStudentId(studentEmail);
-          const studentSubmissions = allSubmissions.filter(
-            (sub) => sub.studentId === studentEmail
-          );
+          // Filter on the server so only this student's submissions are transferred
+          const response = await fetch(`http://localhost:8000/submissions?studentId=${encodeURIComponent(studentEmail)}`);
+          if (!response.ok) {
+            throw new Error("Failed to fetch submissions");
+          }
+          const studentSubmissions = await response.json() as Submission[];
           setSubmissions(studentSubmissions);
         } else {
           // If no student identifier is found, show an error
@@ -9,12 +9,13 @@ import { Separator } from "@/components/ui/separator";
 import { toast } from "@/components/ui/use-toast";
 import { CheckCircle, ChevronLeft, Clock, Eye, Trash2, Hourglass } from "lucide-react";
 import { useAuth } from "@/contexts/AuthContext";
+import { useEventFeed } from "@/hooks/use-event-feed";
 import { getYoutubeEmbedUrl } from "@/lib/utils";
 
 export default function Task() {
   const { taskId } = useParams();
   const navigate = useNavigate();
-  const { user } = useAuth(); // Fetch user details from AuthContext
+  const { user, logout } = useAuth(); // Fetch user details from AuthContext
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [isSubmittedOrGraded, setIsSubmittedOrGraded] = useState(false);
   const [showConfetti, setShowConfetti] = useState(false);
@@ -74,7 +75,20 @@ export default function Task() {
       setIsLoadingSubmission(false);
     };
     fetchSubmission();
-  }, [taskId, user?.email, isSubmittedOrGraded]);
+    // Keyed on the task and student only: submit, delete and the event feed
+    // update the submission in place, so status changes need no re-fetch.
+  }, [taskId, user?.email]);
+
+  // Grades arrive over the event feed instead of re-fetching the submission
+  useEventFeed({ studentId: user?.email }, (event) => {
+    if (event.type !== "submission.graded" || event.taskId !== taskId) return;
+    setStudentSubmission((prev: any) =>
+      prev && prev.id === event.submissionId
+        ? { ...prev, status: event.status, grade: event.grade, feedback: event.feedback }
+        : prev
+    );
+    setIsSubmittedOrGraded(event.status === "graded");
+  });
 
   // For this demo, we'll use mock data if currentTask is null
   const task = currentTask || {
@@ -105,11 +119,6 @@ export default function Task() {
 
     const formData = new FormData();
     formData.append("file", selectedFile);
-    formData.append("student_id", user?.email || "unknown_student@example.com");
-    formData.append("student_name", user?.name || "Unknown Student");
-    if (user?.profileImage) {
-      formData.append("student_image", user.profileImage);
-    }
     formData.append("task_title", task.title);
 
     try {
@@ -119,11 +128,25 @@ export default function Task() {
         url = `http://localhost:8000/submissions/${studentSubmission.id}/replace`;
         method = "PUT";
       }
+      const token = localStorage.getItem("token");
       const response = await fetch(url, {
         method,
         body: formData,
+        headers: token ? { Authorization: `Bearer ${token}` } : undefined,
       });
 
+      if (response.status === 401) {
+        // The stored token expired or was never issued; sign in again
+        logout();
+        toast({
+          title: "Session expired",
+          description: "Please log in again to submit your work.",
+          variant: "destructive",
+        });
+        navigate("/", { replace: true });
+        return;
+      }
+
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({ detail: "Submission failed with status: " + response.status }));
         throw new Error(errorData.detail || "File upload failed");
@@ -38,12 +38,26 @@ export default function Tasks() {
       setLoadingTasks(true);
       setLoadingSubmissions(true);
       try {
-        const response = await fetch("http://localhost:8000/tasks");
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
+        if (user?.email) {
+          // One request returns the tasks with this student's lock state and latest submissions
+          const response = await fetch(`http://localhost:8000/students/${encodeURIComponent(user.email)}/dashboard`);
+          if (!response.ok) {
+            throw new Error("Failed to fetch dashboard");
+          }
+          const data: { tasks: (Task & { latestSubmission?: Submission | null })[] } = await response.json();
+          setTasks(data.tasks);
+          setStudentSubmissions(
+            data.tasks.flatMap(task => (task.latestSubmission ? [task.latestSubmission] : []))
+          );
+        } else {
+          const response = await fetch("http://localhost:8000/tasks");
+          if (!response.ok) {
+            throw new Error("Failed to fetch tasks");
+          }
+          const data: Task[] = await response.json();
+          setTasks(data);
+          setStudentSubmissions([]);
         }
-        const data = await response.json();
-        setTasks(data as Task[]);
       } catch (error) {
         console.error("Failed to fetch tasks:", error);
         toast({
@@ -52,28 +66,10 @@ export default function Tasks() {
           variant: "destructive",
         });
         setTasks([]);
+        setStudentSubmissions([]);
       } finally {
         setLoadingTasks(false);
-      }
-
-      if (user?.email) {
-        try {
-          const submissionsResponse = await fetch(`http://localhost:8000/submissions?studentId=${user.email}`);
-          if (!submissionsResponse.ok) {
-            throw new Error("Failed to fetch student submissions");
-          }
-          const submissionsData: Submission[] = await submissionsResponse.json();
-          setStudentSubmissions(submissionsData);
-        } catch (error) {
-          console.error("Error fetching submissions:", error);
-          toast({ title: "Error", description: "Could not load your submission data.", variant: "destructive" });
-          setStudentSubmissions([]);
-        } finally {
-          setLoadingSubmissions(false);
-        }
-      } else {
         setLoadingSubmissions(false);
-        setStudentSubmissions([]);
       }
     };
 